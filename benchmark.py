@@ -0,0 +1,304 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from extractors import extractor_classes
+from extractors.html_parser import parse_html
+from extractors.raw_cache import PackedRawCache
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+extractors = {cls.broadcaster: cls for cls in extractor_classes()}
+
+# Paths of the extractors which have to be covered by the corpus besides one station of every broadcaster
+REQUIRED_CASES = ['ndr/kultur', 'wdr/wdr3', 'sr/sr2/malformed']
+
+
+def variant(broadcaster: str, station: str, document: bytes) -> str:
+    """Returns the name of the code path the extractor takes for a document if a station has more than one"""
+    if broadcaster == 'sr' and station == 'sr2':
+        soup = parse_html(document, 'bs4').find(class_='musicResearch')
+        return 'malformed' if soup and extractors['sr'].is_malformed(soup) else 'correct'
+    return ''
+
+
+def clock(i: int, rows: int) -> str:
+    """Spreads the rows of a generated page over one day"""
+    return (pd.Timestamp(2024, 1, 1) + pd.Timedelta(minutes=i * 1440 // rows)).strftime('%H:%M')
+
+
+def ndr_kultur_page(rows: int) -> bytes:
+    entries = ''.join(f'<div class="titlelistentry"><div class="timeandplay">{clock(i, rows)} Uhr</div>'
+                      f'<div class="artist">Artist {i}</div><div class="title">Title {i}</div>'
+                      f'<div class="additionalinfo--key">Dirigenten</div>'
+                      f'<div class="additionalinfo--value"><span>Conductor {i}</span></div>'
+                      f'<div class="additionalinfo--key">Solisten</div>'
+                      f'<div class="additionalinfo--value"><span>Soloist {i}</span><span>Soloist {i + 1}</span></div>'
+                      f'</div>' for i in range(rows))
+    return f'<html><body><div id="titlelist">{entries}</div></body></html>'.encode()
+
+
+def wdr3_page(rows: int) -> bytes:
+    entries = ''.join(f'<tr><td class="datetime">01.01.2024,{clock(i, rows).replace(":", ".")} Uhr</td>'
+                      f'<td class="performer"><strong>Solist:</strong> Soloist {i}<strong>Dirigent:</strong> '
+                      f'Conductor {i}</td><td class="title">Title {i}</td><td class="composer">Composer {i}</td></tr>'
+                      for i in range(rows))
+    return f'<html><body><table id="searchPlaylistResult">{entries}</table></body></html>'.encode()
+
+
+def sr2_page(rows: int, malformed: bool) -> bytes:
+    # the malformed pages put all titles and artists into the first content element
+    entries = ''.join(f'<div class="musicResearch__Item__Time">{clock(i, rows)}</div>'
+                      + ('' if malformed or i == 0 else '</div><div class="musicResearch__Item__Content">') +
+                      f'<div class="musicResearch__Item__Content__Title">Composer {i}</div>'
+                      f'<div class="musicResearch__Item__Content__Title">Title {i}</div>'
+                      f'<div class="musicResearch__Item__Content__Artist">Artist {i}</div>'
+                      f'<div class="musicResearch__Item__Content__Artist">Label: {i}</div>' for i in range(rows))
+    return (f'<html><body><div class="musicResearch"><div class="musicResearch__Item__Content">{entries}</div>'
+            f'</div></body></html>').encode()
+
+
+def hr_page(rows: int) -> bytes:
+    entries = ''.join(f'<li><time datetime="2024-01-01T{clock(i, rows)}:00+01:00" content="P{180 + i}S"></time>'
+                      f'<span itemprop="byArtist"><span>Artist {i}</span></span>'
+                      f'<h3 class="text__headline">Title {i}</h3></li>' for i in range(rows))
+    return f'<html><body><ul>{entries}</ul></body></html>'.encode()
+
+
+def mdr_page(rows: int) -> bytes:
+    songs = {str(i): {'status': '', 'id_titel': i, 'av_next_id': '', 'starttime': f'2024-01-01 {clock(i, rows)}:00',
+                      'artist_image_id': '', 'transmissiontype': '', 'audioasset': '', 'duration': f'00:03:{i % 60:02d}',
+                      'interpret': f'Artist {i}', 'title': f'Title {i}'} for i in range(rows)}
+    return json.dumps({'Songs': songs}).encode()
+
+
+def radiobremen_page(rows: int) -> bytes:
+    # newest first, the songs before midnight belong to the previous day
+    entries = ''.join(f'<tr><td>{clock(rows - 1 - i, rows)}</td><td>Artist {i}</td><td>Title {i}</td></tr>'
+                      for i in range(rows))
+    return (f'<html><body><table><thead><tr><th>Uhrzeit</th><th>Interpret</th><th>Titel</th></tr></thead>'
+            f'<tbody>{entries}</tbody></table></body></html>').encode()
+
+
+def radioeins_page(rows: int) -> bytes:
+    entries = ''.join(f'<tr class="play_track"><td class="play_time">{clock(i, rows)}</td>'
+                      f'<td><span class="trackinterpret">Artist {i}</span><span class="tracktitle">Title {i}</span>'
+                      f'</td></tr>' for i in range(rows))
+    return (f'<html><body><div class="playlist_tables"><p class="playlisttime">00:00 - 24:00</p>'
+            f'<div class="playlist_aktueller_tag"><table>{entries}</table></div></div></body></html>').encode()
+
+
+# Generated pages of the extractor paths whose running time used to grow quadratically with the number of rows, and
+# of the extractors which parse a timestamp, time of day or duration per row (see extractors/times.py)
+SCALING_CASES = {'ndr/kultur': ('ndr', 'kultur', ndr_kultur_page),
+                 'wdr/wdr3': ('wdr', 'wdr3', wdr3_page),
+                 'sr/sr2/correct': ('sr', 'sr2', lambda rows: sr2_page(rows, False)),
+                 'sr/sr2/malformed': ('sr', 'sr2', lambda rows: sr2_page(rows, True)),
+                 'hr/hr1': ('hr', 'hr1', hr_page),
+                 'mdr/jump': ('mdr', 'jump', mdr_page),
+                 'radiobremen/bremeneins': ('radiobremen', 'bremeneins', radiobremen_page),
+                 'rbb/radioeins': ('rbb', 'radioeins', radioeins_page)}
+
+
+def case_name(broadcaster: str, station: str, document_variant: str) -> str:
+    return '/'.join(filter(None, [broadcaster, station, document_variant]))
+
+
+def corpus_path(directory: str, broadcaster: str, station: str, t: pd.Timestamp, extension: str) -> str:
+    return os.path.join(directory, broadcaster, f'{station}_{t.strftime("%Y%m%d-%H%M%S")}.{extension}')
+
+
+def record(args):
+    """Copies the newest documents of every station (and every variant) from the raw cache into the corpus"""
+    raw_cache = PackedRawCache()
+    for broadcaster, cls in extractors.items():
+        if args.broadcaster and broadcaster not in args.broadcaster:
+            continue
+
+        os.makedirs(os.path.join(args.corpus, broadcaster), exist_ok=True)
+        for station in cls.stations:
+            entries = raw_cache.entries(broadcaster, station, pd.Timestamp.min, pd.Timestamp.max)
+            counts = defaultdict(int)
+            for t in sorted(entries, reverse=True):
+                if entries[t].status not in (None, 200):
+                    continue
+
+                document = raw_cache.get(broadcaster, station, t)
+                document_variant = variant(broadcaster, station, document)
+                if counts[document_variant] >= args.limit:
+                    continue
+                counts[document_variant] += 1
+                with open(corpus_path(args.corpus, broadcaster, station, t, cls.file_extension), 'wb') as f:
+                    f.write(document)
+
+                # only sr2 has to be searched further for the other variant
+                if document_variant == '' and counts[''] >= args.limit:
+                    break
+
+            for document_variant, count in counts.items():
+                print(f'{case_name(broadcaster, station, document_variant)}: {count} documents recorded')
+
+
+def load_corpus(directory: str) -> dict[str, tuple[str, str, list[tuple[pd.Timestamp, bytes]]]]:
+    """Reads the corpus and groups the documents by case"""
+    cases = defaultdict(list)
+    for path in sorted(glob.glob(os.path.join(directory, '*', '*_*.*'))):
+        broadcaster = os.path.basename(os.path.dirname(path))
+        station, timestamp = os.path.basename(path).rsplit('.', 1)[0].rsplit('_', 1)
+        if broadcaster not in extractors:
+            continue
+
+        with open(path, 'rb') as f:
+            document = f.read()
+        t = pd.to_datetime(timestamp, format='%Y%m%d-%H%M%S')
+        cases[(broadcaster, station, variant(broadcaster, station, document))].append((t, document))
+
+    return {case_name(*key): (key[0], key[1], documents) for key, documents in sorted(cases.items())}
+
+
+def peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, kilobytes on Linux
+
+
+def run_case(broadcaster: str, station: str, documents: list[tuple[pd.Timestamp, bytes]], repeat: int) -> dict:
+    """Extracts the documents of one case repeat times, after one untimed pass to warm up caches.
+
+    Runs in a fresh process, so the peak RSS belongs to this case only."""
+    logging.disable(logging.WARNING)  # some extractors log a warning for every document
+    extractor = extractors[broadcaster]()
+
+    rows = sum(len(extractor.extract(station, document, t)) for t, document in documents)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for t, document in documents:
+            extractor.extract(station, document, t)
+    elapsed = time.perf_counter() - start
+
+    return {'documents': len(documents),
+            'rows': rows,
+            'seconds': elapsed / repeat,
+            'docs_per_sec': len(documents) * repeat / elapsed,
+            'rows_per_sec': rows * repeat / elapsed,
+            'peak_rss_mb': peak_rss_mb()}
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Returns the cases whose throughput dropped by more than tolerance compared to the baseline"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        change = result['docs_per_sec'] / baseline[name]['docs_per_sec'] - 1
+        result['change'] = change
+        if change < -tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def scaling(args):
+    """Extracts generated pages of increasing size. Linear extraction keeps rows/sec constant."""
+    logging.disable(logging.WARNING)
+    results = []
+    for name, (broadcaster, station, page) in SCALING_CASES.items():
+        if args.broadcaster and broadcaster not in args.broadcaster:
+            continue
+
+        extractor = extractors[broadcaster]()
+        for rows in args.rows:
+            document = page(rows)
+            start = time.perf_counter()
+            extracted = len(extractor.extract(station, document, pd.Timestamp(2024, 1, 1)))
+            elapsed = time.perf_counter() - start
+            results.append({'case': name, 'rows': extracted, 'seconds': elapsed, 'rows_per_sec': extracted / elapsed})
+
+    with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.float_format', '{:.3f}'.format):
+        print(pd.DataFrame(results).set_index('case'))
+
+
+def run(args):
+    cases = load_corpus(args.corpus)
+    if args.broadcaster:
+        cases = {name: case for name, case in cases.items() if case[0] in args.broadcaster}
+    if not cases:
+        print(f'No documents found in {args.corpus}, record a corpus first')
+        sys.exit(1)
+
+    covered = {case[0] for case in cases.values()}
+    missing = [b for b in extractors if b not in covered] + [c for c in REQUIRED_CASES if c not in cases]
+    if not args.broadcaster and missing:
+        print(f'Not covered by the corpus: {", ".join(missing)}')
+
+    results = {}
+    for name, (broadcaster, station, documents) in cases.items():
+        # max_tasks_per_child=1: every case gets a new process
+        with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as ex:
+            results[name] = ex.submit(run_case, broadcaster, station, documents, args.repeat).result()
+
+    baseline = {}
+    if os.path.isfile(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+
+    df = pd.DataFrame.from_dict(results, orient='index')
+    df.index.name = 'case'
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200,
+                           'display.float_format', '{:.2f}'.format):
+        print(df)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+    elif regressions:
+        print(f'Slower than the baseline by more than {args.tolerance:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':  # worker processes import this module as well
+    parser = argparse.ArgumentParser(description='Measures the extraction speed of all extractors on a corpus of '
+                                                 'recorded documents')
+    parser.add_argument('--corpus', default=os.path.join('benchmarks', 'corpus'),
+                        help='directory of the recorded documents (default: benchmarks/corpus)')
+    parser.add_argument('--broadcaster', action='append', help='only this broadcaster (can be repeated)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='copy documents from the raw cache into the corpus')
+    record_parser.add_argument('--limit', type=int, default=20,
+                               help='number of newest documents per station and variant (default: 20)')
+
+    run_parser = subparsers.add_parser('run', help='extract the corpus and compare the results to the baseline')
+    run_parser.add_argument('--repeat', type=int, default=3, help='number of timed passes per case (default: 3)')
+    run_parser.add_argument('--baseline', default=os.path.join('benchmarks', 'baseline.json'),
+                            help='file of the stored baseline (default: benchmarks/baseline.json)')
+    run_parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    run_parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='allowed decrease of documents/sec before a case counts as a regression '
+                                 '(default: 0.2)')
+
+    scaling_parser = subparsers.add_parser('scaling', help='extract generated pages of increasing size')
+    scaling_parser.add_argument('--rows', type=int, nargs='+', default=[100, 400, 1600],
+                                help='numbers of rows of the generated pages (default: 100 400 1600)')
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args)
+    elif args.command == 'scaling':
+        scaling(args)
+    else:
+        run(args)
@@ -1,17 +1,54 @@
-from inspect import isclass
-from pkgutil import iter_modules
-from pathlib import Path
 from importlib import import_module
 
-# iterate through the modules in the current package
-package_dir = Path(__file__).resolve().parent
-for (_, module_name, _) in iter_modules([package_dir]):
+# Extractor class of each broadcaster as module:class. Modules are only imported when their class is needed, so
+# importing this package is cheap and a worker process only imports the extractor it uses.
+EXTRACTORS = {'br': 'extractors.br:BrExtractor',
+              'hr': 'extractors.hr:HrExtractor',
+              'mdr': 'extractors.mdr:MdrExtractor',
+              'ndr': 'extractors.ndr:NdrExtractor',
+              'radiobremen': 'extractors.radiobremen:RadiobremenExtractor',
+              'rbb': 'extractors.rbb:RbbExtractor',
+              'sr': 'extractors.sr:SrExtractor',
+              'swr': 'extractors.swr:SwrExtractor',
+              'wdr': 'extractors.wdr:WdrExtractor'}
 
-    # import the module and iterate through its attributes
-    module = import_module(f"{__name__}.{module_name}")
-    for attribute_name in dir(module):
-        attribute = getattr(module, attribute_name)
+# Installed packages can add extractors with an entry point in this group (name: broadcaster, value: module:class)
+ENTRY_POINT_GROUP = 'radio_playlists.extractors'
 
-        if isclass(attribute):
-            # Add the class to this package's variables
-            globals()[attribute_name] = attribute
\ No newline at end of file
+
+def broadcasters() -> list[str]:
+    """Returns the names of all broadcasters with an extractor, without importing the extractors"""
+    from importlib.metadata import entry_points  # only needed here, importing it takes longer than this package
+
+    return list(EXTRACTORS) + [e.name for e in entry_points(group=ENTRY_POINT_GROUP) if e.name not in EXTRACTORS]
+
+
+def extractor_class(broadcaster: str) -> type:
+    """Imports the module of a broadcaster's extractor and returns the extractor class"""
+    if broadcaster in EXTRACTORS:
+        module_name, class_name = EXTRACTORS[broadcaster].split(':')
+        return getattr(import_module(module_name), class_name)
+
+    from importlib.metadata import entry_points
+
+    for e in entry_points(group=ENTRY_POINT_GROUP, name=broadcaster):
+        return e.load()
+    raise KeyError(f'No extractor for broadcaster {broadcaster}')
+
+
+def extractor_classes(names: list[str] | None = None) -> list[type]:
+    """Returns the extractor classes of the given broadcasters (or of all broadcasters)"""
+    return [extractor_class(b) for b in (names or broadcasters())]
+
+
+def __getattr__(name: str):
+    # keeps `from extractors import BrExtractor` working without importing the other extractors
+    for path in EXTRACTORS.values():
+        module_name, class_name = path.split(':')
+        if class_name == name:
+            return getattr(import_module(module_name), class_name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+__all__ = ['EXTRACTORS', 'broadcasters', 'extractor_class', 'extractor_classes'] + \
+          [path.split(':')[1] for path in EXTRACTORS.values()]
@@ -1,7 +1,8 @@
 import pandas as pd
-from bs4 import BeautifulSoup
 
+from extractors.html_parser import parse_html
 from extractors.playlist_extractor import PlaylistExtractor
+from extractors.times import on_date
 
 
 class BrExtractor(PlaylistExtractor):
@@ -12,9 +13,10 @@ class BrExtractor(PlaylistExtractor):
                 'br3': 'radio/bayern-3/bayern-3-100',
                 'br-schlager': 'radio/br-schlager/welle118',
                 'br-heimat': 'radio/br-heimat/welle128'}
+    html_parser = 'lxml'  # extracts the same DataFrames as BeautifulSoup, see tests/test_html_parser.py
 
-    def __init__(self, log=True, sleep_secs=1):
-        super().__init__(log, sleep_secs)
+    def __init__(self, log=True, sleep_secs=1, **kwargs):
+        super().__init__(log, sleep_secs, **kwargs)
 
     def get_times(self, start, end, station) -> pd.DatetimeIndex:
         return pd.date_range(start, end, freq='1h')
@@ -30,13 +32,13 @@ class BrExtractor(PlaylistExtractor):
     def extract(self, station: str, document: bytes, date) -> pd.DataFrame:
         log_extra = {'station': station}
 
-        soup = BeautifulSoup(document, 'html.parser').find(class_='music_research')
+        soup = parse_html(document, self.html_parser).find(class_='music_research')
 
         if not soup:
             self.logger.warning(f'No playlist data found for {date}', extra=log_extra)
             return pd.DataFrame()
 
-        time = [date.strftime('%Y%m%d') + ' ' + e.text for e in soup.find_all(class_='time')]
+        time = [e.text for e in soup.find_all(class_='time')]
 
         try:
             artist = [e.find_all('span')[0].text for e in soup.find_all(class_='title')]
@@ -48,7 +50,7 @@ class BrExtractor(PlaylistExtractor):
         df = pd.DataFrame({
             'artist': artist,
             'title': title
-        }, index=pd.Series(data=pd.to_datetime(time, format='%Y%m%d %H:%M'), name='time'),
+        }, index=pd.Series(data=on_date(date, time), name='time'),
             dtype=str)
 
         return df[df['artist'] != '']
@@ -0,0 +1,104 @@
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable
+
+import pandas as pd
+
+from extractors.raw_cache import TIME_FORMAT
+
+
+class DiscoveryIndex:
+    """Keeps the documents found on index pages (e.g. the playlist finder of RBB) in an SQLite database at
+    {directory}/discovery.sqlite, so they don't have to be crawled again on every run.
+
+    For each station, the table urls maps the timestamp of a document to its url and the table crawled lists the time
+    ranges whose index pages have been crawled completely. Only the parts of a time range which are not covered yet
+    (see gaps) have to be crawled."""
+
+    def __init__(self, directory: str = 'data'):
+        self.directory: str = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(os.path.join(directory, 'discovery.sqlite'), timeout=60,
+                                          check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS urls (broadcaster TEXT, station TEXT, time TEXT, '
+                                    'url TEXT, PRIMARY KEY (broadcaster, station, time))')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS urls_url ON urls (broadcaster, station, url)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS crawled (broadcaster TEXT, station TEXT, start TEXT, '
+                                    'end TEXT)')
+
+    def urls(self, broadcaster: str, station: str, start: pd.Timestamp, end: pd.Timestamp) -> dict[pd.Timestamp, str]:
+        """Returns the urls of the documents between start and end by their timestamp, in chronological order"""
+        with self.lock:
+            rows = self.connection.execute('SELECT time, url FROM urls WHERE broadcaster = ? AND station = ? AND '
+                                           'time BETWEEN ? AND ? ORDER BY time',
+                                           (broadcaster, station, start.strftime(TIME_FORMAT),
+                                            end.strftime(TIME_FORMAT))).fetchall()
+        return {pd.Timestamp(t): url for t, url in rows}
+
+    def url(self, broadcaster: str, station: str, time: pd.Timestamp) -> str | None:
+        with self.lock:
+            row = self.connection.execute('SELECT url FROM urls WHERE broadcaster = ? AND station = ? AND time = ?',
+                                          (broadcaster, station, time.strftime(TIME_FORMAT))).fetchone()
+        return row[0] if row else None
+
+    def add(self, broadcaster: str, station: str,
+            urls: Iterable[tuple[pd.Timestamp, str]]) -> dict[pd.Timestamp, str]:
+        """Adds the urls of documents which are not known yet. If the timestamp of a new document is already taken by
+        another document, it is moved one second later until it is unique. Returns the added urls by timestamp."""
+        added = {}
+        with self.lock, self.connection:
+            for t, url in sorted(urls):
+                if self.connection.execute('SELECT 1 FROM urls WHERE broadcaster = ? AND station = ? AND url = ?',
+                                           (broadcaster, station, url)).fetchone():
+                    continue
+                while self.connection.execute('SELECT 1 FROM urls WHERE broadcaster = ? AND station = ? AND time = ?',
+                                              (broadcaster, station, t.strftime(TIME_FORMAT))).fetchone():
+                    t += pd.Timedelta(seconds=1)
+                self.connection.execute('INSERT INTO urls VALUES (?, ?, ?, ?)',
+                                        (broadcaster, station, t.strftime(TIME_FORMAT), url))
+                added[t] = url
+        return added
+
+    def _crawled(self, broadcaster: str, station: str) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+        rows = self.connection.execute('SELECT start, end FROM crawled WHERE broadcaster = ? AND station = ? '
+                                       'ORDER BY start', (broadcaster, station)).fetchall()
+        return [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in rows]
+
+    def mark_crawled(self, broadcaster: str, station: str, start: pd.Timestamp, end: pd.Timestamp):
+        """Records that the index pages between start and end have been crawled, merging it with the ranges which
+        overlap or touch it (index pages have a resolution of one minute)"""
+        with self.lock, self.connection:
+            merged = []
+            for s, e in sorted(self._crawled(broadcaster, station) + [(start, end)]):
+                if merged and s <= merged[-1][1] + pd.Timedelta(minutes=1):
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+                else:
+                    merged.append((s, e))
+
+            self.connection.execute('DELETE FROM crawled WHERE broadcaster = ? AND station = ?', (broadcaster, station))
+            self.connection.executemany('INSERT INTO crawled VALUES (?, ?, ?, ?)',
+                                        [(broadcaster, station, s.strftime(TIME_FORMAT), e.strftime(TIME_FORMAT))
+                                         for s, e in merged])
+
+    def gaps(self, broadcaster: str, station: str, start: pd.Timestamp,
+             end: pd.Timestamp) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+        """Returns the parts of the time range between start and end which have not been crawled yet, in
+        chronological order"""
+        with self.lock:
+            crawled = self._crawled(broadcaster, station)
+
+        gaps = []
+        t = start
+        for s, e in crawled:
+            if e < t or s > end:
+                continue
+            if s > t + pd.Timedelta(minutes=1):
+                gaps.append((t, s))
+            t = max(t, e)
+        if t < end:
+            gaps.append((t, end))
+        return gaps
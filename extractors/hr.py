@@ -1,7 +1,8 @@
 import pandas as pd
-from bs4 import BeautifulSoup
 
+from extractors.html_parser import parse_html
 from extractors.playlist_extractor import PlaylistExtractor
+from extractors.times import wall_time
 
 
 class HrExtractor(PlaylistExtractor):
@@ -12,9 +13,10 @@ class HrExtractor(PlaylistExtractor):
                 'hr3': 'https://www.hr3.de/playlist/playlist_hrthree-100~inline_date-%s_hour-%s.html',
                 'hr4': 'https://www.hr4.de/musik/titelliste/playlist_hrfour-100~inline_date-%s_hour-%s.html',
                 'youfm': 'https://www.you-fm.de/playlists/was-lief-wann/playlist_you-fm-100~inline_date-%s_hour-%s.html'}
+    html_parser = 'lxml'  # extracts the same DataFrames as BeautifulSoup, see tests/test_html_parser.py
 
-    def __init__(self, log=True, sleep_secs=1):
-        super().__init__(log, sleep_secs)
+    def __init__(self, log=True, sleep_secs=1, **kwargs):
+        super().__init__(log, sleep_secs, **kwargs)
 
     def get_times(self, start, end, station) -> pd.DatetimeIndex:
         return pd.date_range(start, end, freq='1h')
@@ -28,7 +30,7 @@ class HrExtractor(PlaylistExtractor):
     def extract(self, station: str, document: bytes, date) -> pd.DataFrame:
         log_extra = {'station': station}
 
-        soup = BeautifulSoup(document, 'html.parser')
+        soup = parse_html(document, self.html_parser)
 
         df = pd.DataFrame()
         if (not soup.find_all(class_='text__headline') or
@@ -42,14 +44,15 @@ class HrExtractor(PlaylistExtractor):
             'title': [e.string.strip() for e in soup.find_all(class_='text__headline')],
             'duration': [float(e['content'][1:-1]) for e in soup.find_all('time')]
         }, index=pd.Series(
-            data=pd.to_datetime([pd.to_datetime(e['datetime']).tz_localize(None) for e in soup.find_all('time')]),
+            data=wall_time([e['datetime'] for e in soup.find_all('time')]),
             name='time'), dtype=str)
 
         if station == 'hr2-kultur':
             composers = []
             for li in soup.find_all('li'):
+                # html.parser nests unclosed <li> elements, so the composer of a following entry has to be skipped
                 c = li.find(itemprop='composer')
-                if c:
+                if c and c.find_parent('li') == li:
                     composers.append(c.string.strip())
                 else:
                     composers.append('')
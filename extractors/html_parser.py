@@ -0,0 +1,140 @@
+from functools import lru_cache
+
+from bs4 import BeautifulSoup, UnicodeDammit
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+NON_TEXT_TAGS = ('script', 'style', 'template')  # BeautifulSoup doesn't count their content as text
+
+
+def parse_html(document: bytes, backend: str = 'bs4'):
+    """Parses an HTML document with the given backend and returns its root node.
+
+    'bs4' returns a BeautifulSoup object using Python's html.parser. 'lxml' returns an LxmlNode, which supports the
+    part of the BeautifulSoup API used by the extractors (find, find_all, text, string, attributes) with compiled XPath
+    selectors. If lxml is not installed, BeautifulSoup is used."""
+    if backend == 'bs4' or lxml is None:
+        return BeautifulSoup(document, 'html.parser')
+    if backend != 'lxml':
+        raise ValueError(f'Unknown HTML parser backend: {backend}')
+
+    # detect the encoding the same way as BeautifulSoup instead of relying on libxml2's default (latin-1)
+    markup = UnicodeDammit(document, is_html=True).unicode_markup or ''
+    root = lxml.html.document_fromstring(markup.encode('utf-8') or b'<html></html>', parser=utf8_parser())
+    return LxmlNode(root)
+
+
+@lru_cache
+def utf8_parser():
+    return lxml.html.HTMLParser(encoding='utf-8')
+
+
+def class_condition(class_: str) -> str:
+    if ' ' in class_:  # like BeautifulSoup, a class string containing spaces has to match the whole attribute
+        return f'normalize-space(@class) = {xpath_literal(class_)}'
+    return f"contains(concat(' ', normalize-space(@class), ' '), {xpath_literal(' ' + class_ + ' ')})"
+
+
+def xpath_literal(s: str) -> str:
+    if "'" not in s:
+        return f"'{s}'"
+    return 'concat(' + ", \"'\", ".join(f"'{part}'" for part in s.split("'")) + ')'
+
+
+@lru_cache(maxsize=None)
+def compile_selector(name: str | None, classes: tuple[str, ...] | None, attrs: tuple[tuple[str, str], ...],
+                     first: bool) -> 'etree.XPath':
+    """Compiles the XPath expression for a find (first=True) or find_all call. Compiled expressions are cached."""
+    conditions = []
+    if classes:
+        conditions.append(' or '.join(class_condition(c) for c in classes))
+    for key, value in attrs:
+        conditions.append(f'@{key}' if value is True else f'@{key} = {xpath_literal(value)}')
+
+    path = 'descendant::' + (name or '*') + ''.join(f'[{c}]' for c in conditions)
+    if first:
+        path = f'({path})[1]'
+    return etree.XPath(path)
+
+
+TEXT_XPATH = None if lxml is None else etree.XPath(
+    'descendant::text()[not(' + ' or '.join(f'ancestor::{t}' for t in NON_TEXT_TAGS) + ')]')
+
+
+class LxmlNode:
+    """Wraps an lxml element with the subset of the BeautifulSoup Tag API used by the extractors"""
+    __slots__ = ('element',)
+
+    def __init__(self, element):
+        self.element = element
+
+    def _selector(self, name, class_, kwargs, first: bool) -> 'etree.XPath':
+        if class_ is None and 'class' in kwargs:
+            class_ = kwargs.pop('class')
+        classes = (class_,) if isinstance(class_, str) else tuple(class_) if class_ else None
+        attrs = tuple(sorted((k.rstrip('_'), v) for k, v in kwargs.items()))
+        return compile_selector(name, classes, attrs, first)
+
+    def find(self, name: str | None = None, class_: str | list[str] | None = None, **kwargs) -> 'LxmlNode | None':
+        result = self._selector(name, class_, kwargs, first=True)(self.element)
+        return LxmlNode(result[0]) if result else None
+
+    def find_all(self, name: str | None = None, class_: str | list[str] | None = None, **kwargs) -> list['LxmlNode']:
+        return [LxmlNode(e) for e in self._selector(name, class_, kwargs, first=False)(self.element)]
+
+    @property
+    def name(self) -> str:
+        return self.element.tag
+
+    @property
+    def text(self) -> str:
+        if self.element.tag in NON_TEXT_TAGS:
+            return self.element.text or ''
+        return ''.join(TEXT_XPATH(self.element))
+
+    def get_text(self) -> str:
+        return self.text
+
+    @property
+    def string(self) -> str | None:
+        """The only string inside this node (possibly nested in a single child element), like Tag.string"""
+        element = self.element
+        while True:
+            children = [c for c in element if not isinstance(c, etree._ProcessingInstruction)]
+            nodes = (1 if element.text else 0) + len(children) + sum(1 for c in children if c.tail)
+            if nodes != 1:
+                return None
+            if element.text:
+                return str(element.text)
+            if isinstance(children[0], etree._Comment):
+                return str(children[0].text)
+            element = children[0]
+
+    @property
+    def attrs(self) -> dict[str, str | list[str]]:
+        return {k: v.split() if k == 'class' else v for k, v in self.element.attrib.items()}
+
+    def find_parent(self, name: str) -> 'LxmlNode | None':
+        parent = self.element.getparent()
+        while parent is not None and parent.tag != name:
+            parent = parent.getparent()
+        return LxmlNode(parent) if parent is not None else None
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, LxmlNode) and other.element is self.element
+
+    def __hash__(self) -> int:
+        return hash(self.element)
+
+    def get(self, key: str, default=None):
+        return self.attrs.get(key, default)
+
+    def __getitem__(self, key: str):
+        return self.attrs[key]
+
+    def __str__(self) -> str:
+        return etree.tostring(self.element, encoding='unicode', method='html', with_tail=False)
@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from extractors.raw_cache import TIME_FORMAT
+
+
+class ProgressJournal:
+    """Records the progress of the downloads of each station in an SQLite database at {directory}/progress.sqlite:
+    the time windows which have been downloaded completely, the number of rows extracted from and added to the
+    database in each window, and the newest committed timestamp.
+
+    A window whose data can't change anymore (because it was completed more than refetch_within after its end) doesn't
+    have to be downloaded again, so an interrupted update resumes after the newest such window, even if the window
+    contained no data at all."""
+
+    def __init__(self, directory: str = 'data'):
+        self.directory: str = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(os.path.join(directory, 'progress.sqlite'), timeout=60,
+                                          check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS windows (broadcaster TEXT, station TEXT, start TEXT, '
+                                    'end TEXT, extracted_rows INTEGER, added_rows INTEGER, last_committed TEXT, '
+                                    'completed_at TEXT, PRIMARY KEY (broadcaster, station, start))')
+
+    def checkpoint(self, broadcaster: str, station: str, start: pd.Timestamp, end: pd.Timestamp,
+                   new_data: pd.DataFrame, added: pd.DataFrame):
+        """Records a batch of a window which has been committed to the database"""
+        last_committed = new_data.index.max().strftime(TIME_FORMAT) if not new_data.empty else None
+        with self.lock, self.connection:
+            self.connection.execute('INSERT INTO windows VALUES (?, ?, ?, ?, ?, ?, ?, NULL) ON CONFLICT DO UPDATE SET '
+                                    'end = excluded.end, extracted_rows = extracted_rows + excluded.extracted_rows, '
+                                    'added_rows = added_rows + excluded.added_rows, '
+                                    'last_committed = MAX(COALESCE(last_committed, excluded.last_committed), '
+                                    'COALESCE(excluded.last_committed, last_committed)), completed_at = NULL',
+                                    (broadcaster, station, start.strftime(TIME_FORMAT), end.strftime(TIME_FORMAT),
+                                     len(new_data), len(added), last_committed))
+
+    def complete(self, broadcaster: str, station: str, start: pd.Timestamp, end: pd.Timestamp):
+        """Marks a window as downloaded completely, after all its batches have been committed"""
+        with self.lock, self.connection:
+            self.connection.execute('INSERT INTO windows VALUES (?, ?, ?, ?, 0, 0, NULL, ?) ON CONFLICT DO UPDATE SET '
+                                    'end = excluded.end, completed_at = excluded.completed_at',
+                                    (broadcaster, station, start.strftime(TIME_FORMAT), end.strftime(TIME_FORMAT),
+                                     pd.Timestamp.now().strftime(TIME_FORMAT)))
+
+    def resume_time(self, broadcaster: str, station: str, refetch_within: pd.Timedelta) -> pd.Timestamp | None:
+        """Returns the time after the newest window which is complete and final, i.e. where a download can start"""
+        with self.lock:
+            rows = self.connection.execute('SELECT end, completed_at FROM windows WHERE broadcaster = ? AND station = ? '
+                                           'AND completed_at IS NOT NULL', (broadcaster, station)).fetchall()
+        final = [pd.Timestamp(end) for end, completed_at in rows
+                 if pd.Timestamp(completed_at) >= pd.Timestamp(end) + refetch_within]
+        return max(final) + pd.Timedelta(seconds=1) if final else None
+
+    def progress(self, broadcaster: str | None = None) -> pd.DataFrame:
+        """Returns the recorded windows of all stations (or of one broadcaster)"""
+        query = 'SELECT * FROM windows' + (' WHERE broadcaster = ?' if broadcaster else '') + \
+                ' ORDER BY broadcaster, station, start'
+        with self.lock:
+            df = pd.read_sql(query, self.connection, params=[broadcaster] if broadcaster else None)
+        for column in ('start', 'end', 'last_committed', 'completed_at'):
+            df[column] = pd.to_datetime(df[column])
+        return df
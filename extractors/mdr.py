@@ -2,15 +2,17 @@ from collections.abc import Iterable
 
 import pandas as pd
 import json
-import os
 
 from extractors.playlist_extractor import PlaylistExtractor
+from extractors.times import duration_seconds
 
 
 class MdrExtractor(PlaylistExtractor):
     broadcaster = 'mdr'
     oldest_timestamp = pd.Timedelta(days=366)
     file_extension = 'json'
+    dependent_times = True
+    schedule_window = pd.Timedelta(days=7)  # each request returns the last 1000 songs, i.e. several days
     stations = {'jump': 1,
                 'sputnik': 3,
                 'sachsen': 4,
@@ -21,26 +23,22 @@ class MdrExtractor(PlaylistExtractor):
                 'schlagerwelt': 22,
                 'tweens': 23}
 
-    def __init__(self, log=True, sleep_secs=1):
-        super().__init__(log, sleep_secs)
-
-        self.last_timestamp: pd.Timestamp | None = None
+    def __init__(self, log=True, sleep_secs=1, **kwargs):
+        super().__init__(log, sleep_secs, **kwargs)
 
     def get_times(self, start: pd.Timestamp, end: pd.Timestamp, station: str) -> Iterable[pd.Timestamp]:
-        self.last_timestamp: pd.Timestamp = end
-        while self.last_timestamp > start:
-            yield self.last_timestamp
+        # a local variable, because several time windows of a station can be downloaded at the same time
+        last_timestamp: pd.Timestamp = end
+        while last_timestamp > start:
+            yield last_timestamp
 
-            filepath = os.path.join('raw',
-                                    f'{self.broadcaster}_{station}_{self.last_timestamp.strftime("%Y%m%d-%H%M%S")}.{self.file_extension}')
-            with open(filepath) as f:
-                songs = json.load(f)['Songs']
+            songs = json.loads(self.raw_cache.get(self.broadcaster, station, last_timestamp))['Songs']
 
             if not songs:
-                self.last_timestamp -= pd.Timedelta(days=1)
+                last_timestamp -= pd.Timedelta(days=1)
             else:
-                self.last_timestamp = pd.to_datetime(songs[list(songs.keys())[-1]]['starttime'],
-                                                     format='%Y-%m-%d %H:%M:%S')
+                last_timestamp = pd.to_datetime(songs[list(songs.keys())[-1]]['starttime'],
+                                                format='%Y-%m-%d %H:%M:%S')
 
     def get_url(self, station: str, time):
         date = time.strftime('%Y%m%d%H%M%S')
@@ -59,14 +57,13 @@ class MdrExtractor(PlaylistExtractor):
             return df
 
         df = pd.DataFrame.from_dict(data, orient='index')
-        df.set_index(pd.DatetimeIndex(pd.to_datetime(df['starttime']), name='time'), inplace=True)
+        df.set_index(pd.DatetimeIndex(pd.to_datetime(df['starttime'], format='%Y-%m-%d %H:%M:%S'), name='time'),
+                     inplace=True)
 
         drop_columns = ['status', 'id_titel', 'av_next_id', 'starttime', 'artist_image_id', 'transmissiontype',
                         'audioasset']
         df.drop(drop_columns, axis=1, inplace=True)
 
-        df['duration'] = df['duration'].apply(lambda x: pd.to_timedelta(x).seconds)
-
-        self.last_timestamp = df.index[-1]
+        df['duration'] = duration_seconds(df['duration'])
 
         return df
@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Upper bounds of the histogram buckets
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROWS_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+PREFIX = 'radio_playlists_'
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets: tuple[float, ...] = buckets
+        self.counts: list[int] = [0] * (len(buckets) + 1)  # the last bucket is +Inf
+        self.sum: float = 0
+        self.count: int = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Counters and histograms labelled by broadcaster, station etc., shared by all extractors (see
+    PlaylistExtractor.metrics). They can be exported in the Prometheus text format or as JSON.
+
+    span measures the duration of a stage into the histogram {name}_seconds. If trace_path is set, every span is
+    additionally appended to that file as a line of JSON with its start time, duration, labels and thread."""
+
+    def __init__(self, trace_path: str | None = None):
+        self.trace_path: str | None = trace_path
+        self.lock = threading.Lock()
+        self.counters: dict[str, dict[tuple, float]] = defaultdict(lambda: defaultdict(float))
+        self.histograms: dict[str, dict[tuple, Histogram]] = defaultdict(dict)
+
+    @staticmethod
+    def _key(labels: dict[str, str]) -> tuple:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self.lock:
+            self.counters[name][self._key(labels)] += value
+
+    def observe(self, name: str, value: float, buckets: tuple[float, ...] = SECONDS_BUCKETS, **labels):
+        key = self._key(labels)
+        with self.lock:
+            if key not in self.histograms[name]:
+                self.histograms[name][key] = Histogram(buckets)
+            self.histograms[name][key].observe(value)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            self.observe(f'{name}_seconds', duration, **labels)
+            if self.trace_path:
+                line = json.dumps({'span': name, 'start': start, 'duration': duration, 'labels': labels,
+                                   'thread': threading.current_thread().name})
+                with self.lock, open(self.trace_path, 'a') as f:
+                    f.write(line + '\n')
+
+    def to_prometheus(self) -> str:
+        def labels_text(key: tuple, extra: tuple = ()) -> str:
+            pairs = [f'{k}="{v}"' for k, v in key + extra]
+            return '{' + ','.join(pairs) + '}' if pairs else ''
+
+        lines = []
+        with self.lock:
+            for name, values in sorted(self.counters.items()):
+                lines.append(f'# TYPE {PREFIX}{name} counter')
+                lines += [f'{PREFIX}{name}{labels_text(key)} {value:g}' for key, value in sorted(values.items())]
+
+            for name, values in sorted(self.histograms.items()):
+                lines.append(f'# TYPE {PREFIX}{name} histogram')
+                for key, histogram in sorted(values.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                        lines.append(f'{PREFIX}{name}_bucket{labels_text(key, (("le", le),))} {cumulative}')
+                    lines.append(f'{PREFIX}{name}_sum{labels_text(key)} {histogram.sum:g}')
+                    lines.append(f'{PREFIX}{name}_count{labels_text(key)} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+    def to_json(self) -> dict:
+        with self.lock:
+            return {'counters': {name: [{'labels': dict(key), 'value': value} for key, value in sorted(values.items())]
+                                 for name, values in sorted(self.counters.items())},
+                    'histograms': {name: [{'labels': dict(key), 'buckets': dict(zip(map(str, h.buckets + ('+Inf',)),
+                                                                                    h.counts)),
+                                           'sum': h.sum, 'count': h.count} for key, h in sorted(values.items())]
+                                   for name, values in sorted(self.histograms.items())}}
+
+    def write(self, path: str):
+        """Writes the metrics to a file, in the Prometheus text format if it ends with .prom and as JSON otherwise"""
+        content = self.to_prometheus() if path.endswith('.prom') else json.dumps(self.to_json(), indent=2)
+        # written to a temporary file first, so a scraper never reads a partially written file
+        with open(f'{path}.tmp', 'w') as f:
+            f.write(content)
+        os.replace(f'{path}.tmp', path)
@@ -1,7 +1,8 @@
 import pandas as pd
-from bs4 import BeautifulSoup
 
+from extractors.html_parser import parse_html
 from extractors.playlist_extractor import PlaylistExtractor
+from extractors.times import on_date
 
 
 class NdrExtractor(PlaylistExtractor):
@@ -16,9 +17,10 @@ class NdrExtractor(PlaylistExtractor):
                 'ndrblue': 'ndr-blue-titelliste,radioplaylist-ndrblue-100',
                 'ndrschlager': 'titelliste-ndr-schlager,radioplaylist-ndrschlager-100',
                 'n-joy': ''}
+    html_parser = 'lxml'  # extracts the same DataFrames as BeautifulSoup, see tests/test_html_parser.py
 
-    def __init__(self, log=True, sleep_secs=1):
-        super().__init__(log, sleep_secs)
+    def __init__(self, log=True, sleep_secs=1, **kwargs):
+        super().__init__(log, sleep_secs, **kwargs)
 
     def get_times(self, start, end, station) -> pd.DatetimeIndex:
         return pd.date_range(start, end, freq='1h')
@@ -33,8 +35,7 @@ class NdrExtractor(PlaylistExtractor):
 
     def extract(self, station: str, document: bytes, date) -> pd.DataFrame:
         log_extra = {'station': station}
-        date = date.strftime('%Y-%m-%d')
-        soup = BeautifulSoup(document, 'html.parser').find(id='titlelist')
+        soup = parse_html(document, self.html_parser).find(id='titlelist')
 
         df = pd.DataFrame()
         if soup is None:
@@ -47,29 +48,34 @@ class NdrExtractor(PlaylistExtractor):
                       'Ensembles': 'Ensemble',
                       'Solisten': 'Solist'}
 
-            for p in soup.find_all(class_='titlelistentry'):
+            # collect the rows first, creating a DataFrame per entry would copy the whole frame each time
+            rows: dict[pd.Timestamp, dict[str, str | None]] = {}
+            entries = soup.find_all(class_='titlelistentry')
+            timestamps = on_date(date, [p.find(class_='timeandplay').string for p in entries], '%H:%M Uhr')
+            for p, timestamp in zip(entries, timestamps):
                 keys = [i.text if len(i.find_all()) == 0 else i.find_all()[0].text for i in
                         p.find_all(class_='additionalinfo--key')]
                 keys = [plural[i] if i in plural else i for i in keys]
-                values = [[i.text] if len(i.find_all()) == 0 else ', '.join(e.text for e in i.find_all()) for i in
+                values = [i.text if len(i.find_all()) == 0 else ', '.join(e.text for e in i.find_all()) for i in
                           p.find_all(class_='additionalinfo--value')]
-                timestamp: pd.Timestamp = pd.to_datetime(date + ' ' + p.find(class_='timeandplay').string,
-                                           format='%Y-%m-%d %H:%M Uhr')
-                if timestamp in df.index:
+                if timestamp in rows:
                     timestamp += pd.Timedelta(seconds=30)
 
-                df = df.combine_first(pd.DataFrame(
-                    {'artist': [p.find(class_='artist').string],
-                     'title': [p.find(class_='title').string]} | dict(zip(keys, values)),
-                    index=pd.Series(data=[timestamp], name='time'), dtype=str))
+                row = {'artist': p.find(class_='artist').string,
+                       'title': p.find(class_='title').string} | dict(zip(keys, values))
+                if timestamp in rows:
+                    # another entry at the same time only fills the missing values of the existing one
+                    row = row | {k: v for k, v in rows[timestamp].items() if v is not None}
+                rows[timestamp] = row
 
-            # to_add.set_index((f - pd.Timedelta(seconds=30)) if f.second == 30 else f for f in list(to_add.index))
+            if rows:
+                df = pd.DataFrame(list(rows.values()), index=pd.Series(data=list(rows), name='time'),
+                                  dtype=str).sort_index()
         else:
             df = pd.DataFrame({
                 'artist': [e.string for e in soup.find_all(class_='artist')],
                 'title': [e.string for e in soup.find_all(class_='title')]
-            }, index=pd.Series(data=pd.to_datetime([date + ' ' + e.string for e in soup.find_all(class_='timeandplay')],
-                                                   format='%Y-%m-%d %H:%M Uhr'),
+            }, index=pd.Series(data=on_date(date, [e.string for e in soup.find_all(class_='timeandplay')], '%H:%M Uhr'),
                                name='time'), dtype=str)
 
         return df
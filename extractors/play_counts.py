@@ -0,0 +1,155 @@
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from extractors.songs import SongDictionary, normalise
+from extractors.storage import PlaylistStorage
+
+# Periods of the rollups and the pandas frequencies used to find the start of the period of a timestamp
+PERIODS = {'day': 'D',
+           'week': 'W',  # weeks start on Monday
+           'month': 'M'}
+
+
+class PlayCounts:
+    """Number of plays per station, song and day, week and month, stored in an SQLite database at
+    {directory}/play_counts.sqlite. Songs are identified by the song IDs of the SongDictionary in the same directory.
+
+    The counts are updated incrementally from the rows added to the databases, so queries don't depend on the length
+    of the history. Stations whose database existed before the counts are counted once from their whole history."""
+
+    def __init__(self, directory: str = 'data'):
+        self.directory: str = directory
+        self.songs = SongDictionary(os.path.join(directory, 'songs.sqlite'))
+
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(os.path.join(directory, 'play_counts.sqlite'), timeout=60,
+                                          check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS plays (broadcaster TEXT, station TEXT, period TEXT, '
+                                    'start TEXT, song_id INTEGER, plays INTEGER, '
+                                    'PRIMARY KEY (broadcaster, station, period, start, song_id)) WITHOUT ROWID')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS plays_period ON plays (period, start)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS counted_stations (broadcaster TEXT, station TEXT, '
+                                    'PRIMARY KEY (broadcaster, station))')
+        # the keys of the songs are searched in SQL, joined with the plays
+        with self.lock:
+            self.connection.execute('ATTACH DATABASE ? AS dictionary', (self.songs.path,))
+
+    def add(self, broadcaster: str, station: str, rows: pd.DataFrame):
+        """Counts the plays in rows, which have to be new rows of the database of the station"""
+        if rows.empty or 'artist' not in rows.columns or 'title' not in rows.columns:
+            return
+
+        song_ids = self.songs.song_ids(self.songs.encode('artist', rows['artist']),
+                                       self.songs.encode('title', rows['title']))
+        valid = song_ids.notna().to_numpy()
+        times = pd.DatetimeIndex(rows.index[valid])
+        song_ids = song_ids[valid].to_numpy()
+
+        records = []
+        for period, freq in PERIODS.items():
+            starts = times.to_period(freq).start_time.strftime('%Y-%m-%d')
+            counts = pd.DataFrame({'start': starts, 'song_id': song_ids}).value_counts()
+            records += [(broadcaster, station, period, start, int(song_id), int(plays))
+                        for (start, song_id), plays in counts.items()]
+
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT INTO plays VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT DO UPDATE '
+                                        'SET plays = plays + excluded.plays', records)
+
+    def is_counted(self, broadcaster: str, station: str) -> bool:
+        with self.lock:
+            return self.connection.execute('SELECT 1 FROM counted_stations WHERE broadcaster = ? AND station = ?',
+                                           (broadcaster, station)).fetchone() is not None
+
+    def rebuild(self, storage: PlaylistStorage, broadcaster: str, station: str):
+        """Counts the plays of a station again from its whole database"""
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM plays WHERE broadcaster = ? AND station = ?', (broadcaster, station))
+
+        if storage.exists(broadcaster, station):
+            df = storage.read(broadcaster, station)
+            # in yearly chunks to limit the size of the transactions
+            for _, rows in df.groupby(df.index.year):
+                self.add(broadcaster, station, rows)
+
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR IGNORE INTO counted_stations VALUES (?, ?)', (broadcaster, station))
+
+    def top(self, period: str = 'week', start: pd.Timestamp | None = None, end: pd.Timestamp | None = None,
+            stations: list[str | tuple[str, str]] | None = None, n: int = 10, by_station: bool = True) -> pd.DataFrame:
+        """Returns the n most played songs of each day, week or month (period) between start and end, for each station
+        or, if by_station is False, for all selected stations together.
+
+        stations can contain broadcaster names and (broadcaster, station) tuples, None selects all stations."""
+        group = 'broadcaster, station, start' if by_station else 'start'
+        where, params = self._conditions(period, start, end, stations)
+        df = self._read_sql(f'SELECT * FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY {group} '
+                            f'ORDER BY plays DESC, song_id) AS rank FROM ('
+                            f'SELECT {group}, song_id, SUM(plays) AS plays FROM plays WHERE {where} '
+                            f'GROUP BY {group}, song_id)) WHERE rank <= ? ORDER BY {group}, rank', params + [n])
+        return self._with_songs(df)
+
+    def trend(self, artist: str | None = None, title: str | None = None, period: str = 'week',
+              start: pd.Timestamp | None = None, end: pd.Timestamp | None = None,
+              stations: list[str | tuple[str, str]] | None = None, by_station: bool = False) -> pd.DataFrame:
+        """Returns the plays per day, week or month (period) of the songs whose artist and title contain the given
+        strings (compared in their normalised form, see normalise), summed over the selected stations unless
+        by_station is set"""
+        group = 'broadcaster, station, start' if by_station else 'start'
+        where, params = self._conditions(period, start, end, stations)
+        for column, value in (('artist', artist), ('title', title)):
+            if value is not None:
+                where += f' AND instr({column}_keys.key, ?) > 0'
+                params.append(normalise(pd.Series([value]), artist=column == 'artist')[0])
+
+        df = self._read_sql(f'SELECT {group}, song_id, SUM(plays) AS plays FROM plays '
+                            f'JOIN dictionary.songs ON songs.id = plays.song_id '
+                            f'JOIN dictionary.keys artist_keys ON artist_keys.id = songs.artist_key '
+                            f'JOIN dictionary.keys title_keys ON title_keys.id = songs.title_key '
+                            f'WHERE {where} GROUP BY {group}, song_id ORDER BY {group}, song_id', params)
+        return self._with_songs(df)
+
+    @staticmethod
+    def _conditions(period: str, start: pd.Timestamp | None, end: pd.Timestamp | None,
+                    stations: list[str | tuple[str, str]] | None) -> tuple[str, list]:
+        if period not in PERIODS:
+            raise ValueError(f'Unknown period: {period}')
+
+        conditions = ['period = ?']
+        params = [period]
+        if start is not None:
+            # include the period containing start
+            conditions.append('start >= ?')
+            params.append(start.to_period(PERIODS[period]).start_time.strftime('%Y-%m-%d'))
+        if end is not None:
+            conditions.append('start <= ?')
+            params.append(end.strftime('%Y-%m-%d'))
+        if stations is not None:
+            selected = []
+            for s in stations:
+                if isinstance(s, str):
+                    selected.append('broadcaster = ?')
+                    params.append(s)
+                else:
+                    selected.append('(broadcaster = ? AND station = ?)')
+                    params += list(s)
+            conditions.append('(' + (' OR '.join(selected) or '0') + ')')
+
+        return ' AND '.join(conditions), params
+
+    def _read_sql(self, query: str, params: list) -> pd.DataFrame:
+        with self.lock:
+            df = pd.read_sql(query, self.connection, params=params)
+        df['start'] = pd.to_datetime(df['start'])
+        return df
+
+    def _with_songs(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Adds the artist and title of each song ID"""
+        songs = self.songs.songs(df['song_id'].unique().tolist())[['artist', 'title']]
+        return df.join(songs, on='song_id')
@@ -1,32 +1,47 @@
-import glob
 import json
 import logging.config
 import os
 import sys
+import threading
 import time
 from abc import abstractmethod, ABC
-from collections.abc import Iterable
-from timeit import default_timer as timer
+from collections import deque
+from collections.abc import Callable, Generator, Iterable, Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 from typing import Any
+from urllib.parse import urlsplit
 
 import pandas as pd
-import requests
-from requests import Response
 from tqdm.auto import tqdm
 
-
-class PlaylistExtractor(ABC):
-    if not os.path.isdir('logs'):
-        os.mkdir('logs')
-    if not os.path.isdir('data'):
-        os.mkdir('data')
-    if not os.path.isdir('raw'):
-        os.mkdir('raw')
-
-    with open('logging_config.json', 'r') as f:
+from extractors.journal import ProgressJournal
+from extractors.metrics import ROWS_BUCKETS, Metrics
+from extractors.play_counts import PlayCounts
+from extractors.rate_limiter import RateLimiter
+from extractors.raw_cache import RawCache
+from extractors.storage import CsvStorage, PlaylistStorage
+from extractors.transport import RequestsTransport, Transport, TransportResponse
+
+
+def setup_logging(config_path: str | None = None):
+    """Configures logging from logging_config.json (in the working directory or else next to the extractors package)
+    and creates the directories of its log files. Has to be called explicitly by scripts, importing the extractors has
+    no side effects."""
+    if config_path is None:
+        config_path = 'logging_config.json'
+        if not os.path.isfile(config_path):
+            config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), config_path)
+
+    with open(config_path, 'r') as f:
         config = json.load(f)
+    for handler in config.get('handlers', {}).values():
+        if 'filename' in handler:
+            os.makedirs(os.path.dirname(handler['filename']) or '.', exist_ok=True)
     logging.config.dictConfig(config)
 
+
+class PlaylistExtractor(ABC):
     logger = logging.getLogger('RadioPlaylists')
     logger.setLevel(logging.DEBUG)
 
@@ -36,13 +51,93 @@ class PlaylistExtractor(ABC):
     oldest_timestamp: pd.Timedelta | pd.Timestamp | dict[str, pd.Timedelta | pd.Timestamp] = pd.Timestamp.now()
     file_extension: str = 'html'
 
-    def __init__(self, log: bool = True, sleep_secs: int = 1):
-        self.sleep_secs: int = sleep_secs
-        self.session = requests.Session()
-        self.session.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                                                   'AppleWebKit/537.36 (KHTML, like Gecko) '
-                                                   'Chrome/112.0.0.0 '
-                                                   'Safari/537.36 OPR/98.0.0.0'})
+    # Backend used by parse_html: 'bs4' (BeautifulSoup with html.parser) or 'lxml' (fast, compiled selectors). lxml
+    # repairs malformed HTML differently, so an extractor should only switch to it after tests/test_html_parser.py (on
+    # fixtures of its pages) and parser_parity.py (on the raw cache of its stations) found no differences.
+    html_parser: str = 'bs4'
+
+    # Whether each timestamp from get_times depends on the response for the previous one, which forces sequential
+    # downloads (or a dict with the value for each station). None means that generators are treated as dependent and
+    # everything else as independent.
+    dependent_times: bool | dict[str, bool] | None = None
+
+    # Maximum number of simultaneous requests to a single host, shared by all extractors and stations
+    max_requests_per_host: int = 4
+    host_semaphores: dict[str, threading.BoundedSemaphore] = {}
+    host_semaphores_lock = threading.Lock()
+
+    # Request budget per host, shared by all extractors and stations. Each host allows 1 / sleep_secs requests per
+    # second on average and request_burst requests at once. 429 and 503 responses are retried up to max_retries times.
+    rate_limiter = RateLimiter()
+    request_burst: int = 2
+    max_retries: int = 5
+
+    # Counters and histograms of the requests, extraction and storage, shared by all extractors and stations
+    metrics = Metrics()
+
+    # Extracted data is written to the database in batches of at least this many rows
+    flush_rows: int = 10000
+
+    # Length of the time windows the Scheduler splits the time range of a station into
+    schedule_window: pd.Timedelta = pd.Timedelta(days=1)
+
+    def __init__(self, log: bool = True, sleep_secs: float = 1, max_workers: int = 4,
+                 storage: PlaylistStorage | None = None, raw_cache: RawCache | None = None,
+                 extract_workers: int = 1, extract_chunksize: int = 16, play_counts: PlayCounts | None = None,
+                 transport: Transport | None = None, journal: ProgressJournal | None = None,
+                 extract_pool: Executor | None = None):
+        self.sleep_secs: float = sleep_secs
+        self.max_workers: int = max_workers
+        self.extract_workers: int = extract_workers
+        self.extract_chunksize: int = extract_chunksize
+        self.storage: PlaylistStorage = storage or CsvStorage()
+        # the SQLite databases are only created and opened when they are first used, so creating an extractor (e.g. in
+        # a worker process which only extracts documents) doesn't touch the file system
+        self._raw_cache: RawCache | None = raw_cache
+        self._play_counts: PlayCounts | None = play_counts
+        self._journal: ProgressJournal | None = journal
+        self.lazy_lock = threading.Lock()
+        # process pool extracting the documents if extract_workers is greater than 1, shared by all stations and windows
+        # (and by several extractors if it is passed in). Created on first use otherwise and shut down by close.
+        self._extract_pool: Executor | None = extract_pool
+        self.owns_extract_pool: bool = extract_pool is None
+        # shared by all stations, with a connection pool large enough for the requests allowed per host
+        self.transport: Transport = transport or RequestsTransport(pool_maxsize=max(10, self.max_requests_per_host))
+
+    @property
+    def raw_cache(self) -> RawCache:
+        with self.lazy_lock:
+            if self._raw_cache is None:
+                self._raw_cache = RawCache()
+            return self._raw_cache
+
+    @property
+    def play_counts(self) -> PlayCounts:
+        with self.lazy_lock:
+            if self._play_counts is None:
+                self._play_counts = PlayCounts(self.storage.directory)
+            return self._play_counts
+
+    @property
+    def journal(self) -> ProgressJournal:
+        with self.lazy_lock:
+            if self._journal is None:
+                self._journal = ProgressJournal(self.storage.directory)
+            return self._journal
+
+    @property
+    def extract_pool(self) -> Executor:
+        with self.lazy_lock:
+            if self._extract_pool is None:
+                self._extract_pool = ProcessPoolExecutor(max_workers=self.extract_workers)
+            return self._extract_pool
+
+    def close(self):
+        """Shuts down the extraction processes started by this extractor"""
+        with self.lazy_lock:
+            if self._extract_pool is not None and self.owns_extract_pool:
+                self._extract_pool.shutdown()
+                self._extract_pool = None
 
     @abstractmethod
     def get_times(self, start: pd.Timestamp, end: pd.Timestamp, station: str) -> Iterable[pd.Timestamp]:
@@ -59,135 +154,270 @@ class PlaylistExtractor(ABC):
         """Extracts the playlist information from the downloaded document and puts it into a DataFrame"""
         pass
 
-    def download(self, station: str, start, end, progress_bar=None) -> pd.DataFrame:
-        def try_post() -> Response | None:
-            while True:
-                try:
-                    url, data = self.get_url(station, t)
-                    if data:
-                        req = self.session.post(url, data)
-                    else:
-                        req = self.session.get(url)
-                except requests.exceptions.RequestException as e:
-                    self.logger.warning(f'Error while downloading data from {t}: {e} (trying again)', extra=log_extra)
-                    time.sleep(self.sleep_secs)
-                    continue
-
-                if req.status_code != 200:
-                    self.logger.warning(
-                        f'Bad status code while downloading data from {t}: {req.status_code} {req.reason}',
-                        extra=log_extra)
-
-                time.sleep(self.sleep_secs)
-                return req
-
+    @classmethod
+    def host_semaphore(cls, url: str) -> threading.BoundedSemaphore:
+        """Returns the semaphore limiting the number of simultaneous requests to the host of the given url"""
+        host = urlsplit(url).netloc
+        with cls.host_semaphores_lock:
+            if host not in cls.host_semaphores:
+                cls.host_semaphores[host] = threading.BoundedSemaphore(cls.max_requests_per_host)
+            return cls.host_semaphores[host]
+
+    def request(self, url: str, data=None, headers: dict[str, str] | None = None,
+                labels: dict[str, str] | None = None) -> TransportResponse:
+        """Sends a GET request (or a POST request if form data is given) as soon as the rate limit of the host allows.
+        The time waiting for the host is measured as throttle_seconds and the request itself as request_seconds."""
+        labels = labels or {'broadcaster': self.broadcaster}
+        waiting = time.perf_counter()
+        with self.host_semaphore(url):
+            self.rate_limiter.acquire(url, 1 / self.sleep_secs if self.sleep_secs else 0, self.request_burst)
+            self.metrics.observe('throttle_seconds', time.perf_counter() - waiting, **labels)
+            with self.metrics.span('request', **labels):
+                return self.transport.request(url, data, headers)
+
+    def request_with_retries(self, station: str, url: str, data=None, headers: dict[str, str] | None = None,
+                             description: str | None = None) -> TransportResponse:
+        """Sends a request like request, retrying it after connection errors and (up to max_retries times) after 429
+        and 503 responses with the backoff of the rate limiter. Other bad status codes are logged and returned."""
         log_extra = {'station': station}
+        labels = {'broadcaster': self.broadcaster, 'station': station}
+        description = description or url
+        retries = 0
+        while True:
+            try:
+                req = self.request(url, data, headers, labels)
+            except self.transport.errors as e:
+                self.metrics.inc('retries_total', reason=type(e).__name__, **labels)
+                delay = self.rate_limiter.failure(url)
+                self.logger.warning(f'Error while downloading {description}: {e} (trying again in {delay:.1f}s)',
+                                    extra=log_extra)
+                continue
+
+            self.metrics.inc('responses_total', status=req.status_code, **labels)
+            self.metrics.inc('response_bytes_total', len(req.content), **labels)
+            if req.status_code in (429, 503) and retries < self.max_retries:
+                self.metrics.inc('retries_total', reason=req.status_code, **labels)
+                delay = self.rate_limiter.failure(url, req.headers.get('Retry-After'))
+                self.logger.warning(f'Rate limited while downloading {description}: {req.status_code} {req.reason} '
+                                    f'(trying again in {delay:.1f}s)', extra=log_extra)
+                retries += 1
+                continue
+
+            if req.status_code not in (200, 304):
+                self.logger.warning(f'Bad status code while downloading {description}: {req.status_code} {req.reason}',
+                                    extra=log_extra)
+            else:
+                self.rate_limiter.success(url)
+
+            return req
+
+    def extract_documents(self, station: str,
+                          documents: Iterable[tuple[pd.Timestamp, bytes]]) -> Iterator[tuple[pd.Timestamp, pd.DataFrame]]:
+        """Extracts the given documents in order. If extract_workers is greater than 1, chunks of extract_chunksize
+        documents are extracted in parallel by the extract_pool."""
+        labels = {'broadcaster': self.broadcaster, 'station': station}
+        if self.extract_workers <= 1:
+            for t, document in documents:
+                with self.metrics.span('extract', **labels):
+                    df = self.extract(station, document, t)
+                self.metrics.observe('rows_per_document', len(df), ROWS_BUCKETS, **labels)
+                yield t, df
+            return
+
+        documents = iter(documents)
+        pending: deque[tuple[list[pd.Timestamp], Future]] = deque()
+        executor = self.extract_pool
+        while chunk := list(islice(documents, self.extract_chunksize)):
+            pending.append(([t for t, _ in chunk], executor.submit(extract_chunk, type(self), station, chunk)))
+
+            # only keep a few chunks per worker in memory
+            while len(pending) > 2 * self.extract_workers:
+                times, future = pending.popleft()
+                yield from self._observe_chunk(times, future.result(), labels)
+
+        while pending:
+            times, future = pending.popleft()
+            yield from self._observe_chunk(times, future.result(), labels)
+
+    def _observe_chunk(self, times: list[pd.Timestamp], results: list[tuple[pd.DataFrame, float]],
+                       labels: dict[str, str]) -> Iterator[tuple[pd.Timestamp, pd.DataFrame]]:
+        for t, (df, seconds) in zip(times, results):
+            self.metrics.observe('extract_seconds', seconds, **labels)
+            self.metrics.observe('rows_per_document', len(df), ROWS_BUCKETS, **labels)
+            yield t, df
+
+    def download_documents(self, station: str, start, end, progress_bar,
+                           skip_unchanged_before: pd.Timestamp | None = None) -> Iterator[tuple[pd.Timestamp, bytes]]:
+        """Downloads the documents of a station between start and end (unless they are cached) and yields them in the
+        order of get_times while later documents are still being downloaded.
+
+        Cached documents which have to be downloaded again are requested conditionally with their ETag and
+        Last-Modified validators. Documents before skip_unchanged_before which turn out to be unchanged are not
+        yielded, because their data has already been extracted."""
+        def try_post(t: pd.Timestamp, headers: dict[str, str]) -> TransportResponse:
+            url, data = self.get_url(station, t)
+            return self.request_with_retries(station, url, data, headers, f'data from {t}')
+
+        def fetch(t: pd.Timestamp) -> tuple[pd.Timestamp, bytes, str, bool, bool]:
+            entry = cached.get(t)
+            if entry is not None and not self.raw_cache.is_stale(entry):
+                self.metrics.inc('cache_hits_total', **labels)
+                return t, self.raw_cache.get(self.broadcaster, station, t), \
+                    f'File for {t} is already present at {entry.path}', False, True
+
+            req = try_post(t, self.raw_cache.conditional_headers(entry))
+            etag, last_modified = req.headers.get('ETag'), req.headers.get('Last-Modified')
+            if req.status_code == 304:
+                self.raw_cache.revalidate(self.broadcaster, station, entry, etag, last_modified)
+                return t, self.raw_cache.get(self.broadcaster, station, t), \
+                    f'Data from {t} has not changed ({req.elapsed.total_seconds():.3f}s)', True, False
+
+            new_entry = self.raw_cache.put(self.broadcaster, station, t, self.file_extension, req.content,
+                                           req.status_code, etag, last_modified, entry)
+            changed = entry is None or new_entry.hash != entry.hash or new_entry.status != entry.status
+
+            return t, req.content, f'Downloaded data from {t} ({req.elapsed.total_seconds():.3f}s)', True, changed
 
-        progress_bar = progress_bar or tqdm(desc=f'{self.broadcaster}: {station}', file=sys.stdout,
-                                            total=(end - start) // pd.Timedelta(minutes=1), unit='h', unit_scale=60,
-                                            leave=False,
-                                            bar_format="{desc:<20.20}{percentage:3.0f}%|{bar:40}{r_bar}")
+        log_extra = {'station': station}
+        labels = {'broadcaster': self.broadcaster, 'station': station}
 
-        # Downloading
-        new_files: list[str] = []
+        cached = self.raw_cache.entries(self.broadcaster, station, start, end)
 
-        present_files = glob.glob(f'raw/{self.broadcaster}_{station}_*')
-        if present_files:
-            newest_date = pd.to_datetime(max(present_files).split('_')[-1].split('.')[0], format='%Y%m%d-%H%M%S').floor(
-                '1D') - pd.Timedelta(days=1)
-        else:
-            newest_date = pd.Timestamp.now()
+        times = self.get_times(start, end, station)
+        dependent = self.dependent_times.get(station) if isinstance(self.dependent_times, dict) \
+            else self.dependent_times
+        if dependent is None:
+            dependent = isinstance(times, Generator)
 
         prev_t = None
-        for t in self.get_times(start, end, station):
-            if prev_t is None:
-                prev_t = t
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # a dependent generator may only advance after the file for its previous timestamp has been written
+            results = map(fetch, times) if dependent else bounded_map(executor, fetch, times, 4 * self.max_workers)
+            for t, document, status_msg, downloaded, changed in results:
+                if prev_t is None:
+                    prev_t = t
 
-            filepath = os.path.join('raw',
-                                    f'{self.broadcaster}_{station}_{t.strftime("%Y%m%d-%H%M%S")}.{self.file_extension}')
-            if os.path.isfile(filepath) and t < newest_date:
-                status_msg = f'File for {t} is already present at {filepath}'
-            else:
-                request_timer = timer()
-                req = try_post()
-                with open(filepath, 'wb') as f:
-                    f.write(req.content)
+                if downloaded:
+                    progress_bar.set_postfix_str(status_msg)
 
-                status_msg = f'Downloaded data from {t} ({timer() - request_timer - self.sleep_secs:.3f}s)'
-                progress_bar.set_postfix_str(status_msg)
+                self.logger.info(status_msg, extra=log_extra)
 
-            new_files.append(filepath)
-            self.logger.info(status_msg, extra=log_extra)
+                try:
+                    progress_bar.update(abs(t - prev_t) // pd.Timedelta(minutes=1))
+                except TypeError as e:  # if n > total, tqdm will throw a TypeError
+                    self.logger.error(f"Exception while updating the progress bar: {e}", extra=log_extra)
+                    progress_bar.total = progress_bar.n
+                    progress_bar.refresh()
 
-            try:
-                progress_bar.update(abs(t - prev_t) // pd.Timedelta(minutes=1))
-            except TypeError as e:  # if n > total, tqdm will throw a TypeError
-                self.logger.error(f"Exception while updating the progress bar: {e}", extra=log_extra)
-                progress_bar.total = progress_bar.n
-                progress_bar.refresh()
+                prev_t = t
+                if not changed and skip_unchanged_before is not None and t < skip_unchanged_before:
+                    continue
+                yield t, document
 
-            prev_t = t
+    def stream(self, station: str, start, end, progress_bar, skip_unchanged: bool = False) -> Iterator[pd.DataFrame]:
+        """Downloads and extracts the data of a station between start and end. Documents are extracted while later
+        documents are still being downloaded, and the extracted data is yielded in batches of at least flush_rows rows.
 
-        # Extracting
-        pages = []
-        for path in new_files:
-            date = pd.to_datetime(path.split('_')[-1].split('.')[0], format='%Y%m%d-%H%M%S')
-            with open(path, 'rb') as f:
-                file = f.read()
+        If skip_unchanged is set, downloaded documents which are identical to their cached version are not extracted
+        again if they are older than the newest row of the database."""
+        log_extra = {'station': station}
+        skip_unchanged_before = self.storage.last_timestamp(self.broadcaster, station) if skip_unchanged else None
 
-            extracted = self.extract(station, file, date)
-            pages.append(extracted)
+        batch = []
+        rows = 0
+        prev_t = None
+        backwards = False
+        documents = self.download_documents(station, start, end, progress_bar, skip_unchanged_before)
+        for t, extracted in self.extract_documents(station, documents):
+            batch.append(extracted)
+            rows += len(extracted)
 
-            status_msg = f'Extracted data from {path} - {len(extracted)} elements found'
+            status_msg = f'Extracted data from {t} - {len(extracted)} elements found'
             progress_bar.set_postfix_str(status_msg)
             self.logger.info(status_msg, extra=log_extra)
 
+            # Data of a stream going backwards in time is only yielded at the end, because a restarted update
+            # continues after the newest stored row and would skip the older data that has not been stored yet
+            backwards = backwards or (prev_t is not None and t < prev_t)
+            prev_t = t
+            if rows >= self.flush_rows and not backwards:
+                yield pd.concat(batch)
+                batch = []
+                rows = 0
+
+        if batch:
+            yield pd.concat(batch)
+
+    def download(self, station: str, start, end, progress_bar=None) -> pd.DataFrame:
+        progress_bar = progress_bar or tqdm(desc=f'{self.broadcaster}: {station}', file=sys.stdout,
+                                            total=(end - start) // pd.Timedelta(minutes=1), unit='h', unit_scale=60,
+                                            leave=False,
+                                            bar_format="{desc:<20.20}{percentage:3.0f}%|{bar:40}{r_bar}")
+
+        pages = list(self.stream(station, start, end, progress_bar))
         if not pages:
             return pd.DataFrame()
 
         return pd.concat(pages)
 
-    def update_databases(self, stations: list[str] | None = None):
-        stations = stations or self.stations
-        with tqdm(file=sys.stdout, leave=False, unit='h', unit_scale=1 / 60,
-                  bar_format='{desc:<30.30}{percentage:3.0f}%|{bar:40}{r_bar}') as pbar:
-            time_ranges = {}  # precalculate start and end time for each station for correct progress bar
-            for station in stations:
-                path = os.path.join('data', f'{self.broadcaster}_{station}.csv')
+    def update_range(self, station: str) -> tuple[pd.Timestamp, pd.Timestamp]:
+        """Returns the start and end time of the data which has to be downloaded to bring the database of a station up
+        to date. Starts after the newest window which the journal records as complete and final if that is later
+        than the newest row."""
+        last_timestamp = self.storage.last_timestamp(self.broadcaster, station)
+
+        start = self.oldest_timestamp[station] if isinstance(self.oldest_timestamp,
+                                                             dict) else self.oldest_timestamp
+
+        if isinstance(start, pd.Timedelta):
+            start = (pd.Timestamp.now() - start)
+
+        if last_timestamp is not None:
+            start = max(start, last_timestamp)
+
+        start = start.floor('1D')
+        end = pd.Timestamp.now().ceil('1D')
 
-                if os.path.isfile(path):
-                    df = pd.read_csv(path, parse_dates=[0], index_col='time')
-                else:
-                    df = pd.DataFrame()
+        resume_time = self.journal.resume_time(self.broadcaster, station, self.raw_cache.refetch_within)
+        if resume_time is not None:
+            start = max(start, resume_time)
 
-                start = self.oldest_timestamp[station] if isinstance(self.oldest_timestamp,
-                                                                     dict) else self.oldest_timestamp
+        if start > end:
+            raise ValueError(f'{station}: End time is later than start time')
 
-                if isinstance(start, pd.Timedelta):
-                    start = (pd.Timestamp.now() - start)
+        return start, end
 
-                if not df.empty:
-                    start = max(start, df.iloc[-1].name)
+    def prepare_station(self, station: str):
+        """Counts the plays of a database which existed before the play counts"""
+        if not self.play_counts.is_counted(self.broadcaster, station):
+            self.play_counts.rebuild(self.storage, self.broadcaster, station)
 
-                start = start.floor('1D')
-                end = pd.Timestamp.now().ceil('1D')
+    def store(self, station: str, new_data: pd.DataFrame,
+              window: tuple[pd.Timestamp, pd.Timestamp] | None = None) -> pd.DataFrame:
+        """Adds new data to the database of a station and updates the play counts. Returns the added rows.
 
-                if start > end:
-                    raise ValueError(f'{station}: End time is later than start time')
+        If the data belongs to a time window (start, end), the batch is recorded in the journal."""
+        labels = {'broadcaster': self.broadcaster, 'station': station}
+        with self.metrics.span('store', **labels):
+            added = self.storage.update(self.broadcaster, station, new_data)
+            self.play_counts.add(self.broadcaster, station, added)
+        self.metrics.inc('rows_added_total', len(added), **labels)
 
-                time_ranges[station] = (start, end)
+        if window is not None:
+            self.journal.checkpoint(self.broadcaster, station, *window, new_data, added)
+        return added
+
+    def update_databases(self, stations: list[str] | None = None):
+        stations = stations or self.stations
+        with tqdm(file=sys.stdout, leave=False, unit='h', unit_scale=1 / 60,
+                  bar_format='{desc:<30.30}{percentage:3.0f}%|{bar:40}{r_bar}') as pbar:
+            # precalculate start and end time for each station for correct progress bar
+            time_ranges = {station: self.update_range(station) for station in stations}
 
             pbar.total = sum((end - start) // pd.Timedelta(minutes=1) for start, end in time_ranges.values())
             pbar.bar_format = '{desc:<30.30}{percentage:3.0f}%|{bar:40}| {n:.0f}/{total:.0f} [{elapsed}<{remaining}, {rate_fmt}{postfix}]'
 
             for station in stations:
-                path = os.path.join('data', f'{self.broadcaster}_{station}.csv')
-
-                if os.path.isfile(path):
-                    df = pd.read_csv(path, parse_dates=[0], index_col='time')
-                else:
-                    df = pd.DataFrame()
-
                 start, end = time_ranges[station]
 
                 try:
@@ -198,11 +428,40 @@ class PlaylistExtractor(ABC):
                     pbar.total = pbar.n
                     pbar.refresh()
 
-                new_data = self.download(station, start, end, progress_bar=pbar)
+                self.prepare_station(station)
+
+                for new_data in self.stream(station, start, end, pbar, skip_unchanged=True):
+                    self.store(station, new_data, (start, end))
+                self.journal.complete(self.broadcaster, station, start, end)
+
+
+def bounded_map(executor: Executor, fn: Callable, iterable: Iterable, window: int) -> Iterator:
+    """Like executor.map, but only submits the next item when less than `window` results are pending, so the results
+    of a long iterable don't pile up in memory when they are consumed slower than they are produced"""
+    pending: deque[Future] = deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+
+worker_extractors: dict[type[PlaylistExtractor], PlaylistExtractor] = {}
+
+
+def extract_chunk(cls: type[PlaylistExtractor], station: str,
+                  chunk: list[tuple[pd.Timestamp, bytes]]) -> list[tuple[pd.DataFrame, float]]:
+    """Extracts a chunk of documents in a worker process, reusing one extractor instance per class. Returns the
+    extracted DataFrames with the time in seconds each document took."""
+    if cls not in worker_extractors:
+        worker_extractors[cls] = cls()
+    extractor = worker_extractors[cls]
 
-                df = pd.concat([df, new_data])
-                df.index.rename('time', inplace=True)
-                df['time'] = df.index
-                df.drop_duplicates(inplace=True)
-                df.drop(columns='time', inplace=True)
-                df.sort_index().to_csv(path)
+    results = []
+    for t, document in chunk:
+        start = time.perf_counter()
+        df = extractor.extract(station, document, t)
+        results.append((df, time.perf_counter() - start))
+    return results
@@ -0,0 +1,127 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import pandas as pd
+from tqdm.auto import tqdm
+
+from extractors.playlist_extractor import PlaylistExtractor
+
+
+class Poller:
+    """Keeps the databases of several extractors up to date in a long-running process.
+
+    Every station is polled every `interval`: only the documents from the hour of its newest stored row up to now are
+    downloaded, and only the rows which are not stored yet are added. The extractor instances, and with them their HTTP
+    sessions and caches, are kept between polls. A station without a database is first brought up to date like in a
+    batch update (see PlaylistExtractor.update_range).
+
+    The newest songs of all stations are kept in memory (see now_playing) and, if now_playing_path is set, written to
+    that csv file after every poll which found new songs. If metrics_path is set, the metrics of the extractors are
+    written to that file after every poll (see Metrics.write)."""
+
+    def __init__(self, extractors: list[PlaylistExtractor], interval: pd.Timedelta = pd.Timedelta(minutes=1),
+                 workers: int = 8, now_playing_path: str | None = os.path.join('data', 'now-playing.csv'),
+                 songs_per_station: int = 10, metrics_path: str | None = None):
+        self.extractors: list[PlaylistExtractor] = extractors
+        self.interval: pd.Timedelta = interval
+        self.workers: int = workers
+        self.now_playing_path: str | None = now_playing_path
+        self.songs_per_station: int = songs_per_station
+        self.metrics_path: str | None = metrics_path
+        self.logger = PlaylistExtractor.logger
+
+        self.latest: dict[tuple[str, str], pd.DataFrame] = {}
+        # the progress of a poll is only logged
+        self.progress_bar = tqdm(disable=True)
+
+    def poll(self, extractor: PlaylistExtractor, station: str) -> pd.DataFrame:
+        """Downloads the new songs of a station, stores them and returns them"""
+        last_timestamp = extractor.storage.last_timestamp(extractor.broadcaster, station)
+        if last_timestamp is None:
+            extractor.prepare_station(station)
+            start = extractor.update_range(station)[0]
+        else:
+            start = last_timestamp.floor('1h')
+
+        added = [extractor.store(station, new_data)
+                 for new_data in extractor.stream(station, start, pd.Timestamp.now(), self.progress_bar,
+                                                  skip_unchanged=True)]
+        added = pd.concat(added) if added else pd.DataFrame()
+
+        if not added.empty:
+            key = (extractor.broadcaster, station)
+            latest = pd.concat([self.latest[key], added]) if key in self.latest else added
+            self.latest[key] = latest.sort_index(kind='stable').iloc[-self.songs_per_station:]
+            self.logger.info(f'{len(added)} new songs, newest at {added.index.max()}', extra={'station': station})
+
+        return added
+
+    def now_playing(self) -> pd.DataFrame:
+        """Returns the newest songs found by the polls of each station"""
+        if not self.latest:
+            return pd.DataFrame(columns=['broadcaster', 'station', 'artist', 'title'])
+
+        frames = []
+        for (broadcaster, station), df in list(self.latest.items()):  # polls can add stations meanwhile
+            df = df[[c for c in ('artist', 'title') if c in df.columns]].copy()
+            df.insert(0, 'broadcaster', broadcaster)
+            df.insert(1, 'station', station)
+            frames.append(df)
+        return pd.concat(frames).sort_index(kind='stable')
+
+    def write_now_playing(self):
+        # written to a temporary file first, so readers never see a partially written file
+        temporary_path = f'{self.now_playing_path}.tmp'
+        self.now_playing().to_csv(temporary_path)
+        os.replace(temporary_path, self.now_playing_path)
+
+    def run(self, polls: int | None = None):
+        """Polls all stations until interrupted (or until every station was polled the given number of times)"""
+        stations = [(extractor, station) for extractor in self.extractors for station in extractor.stations]
+        due = {(e.broadcaster, s): pd.Timestamp.now() for e, s in stations}
+        counts = {key: 0 for key in due}
+        running: dict[Future, tuple[PlaylistExtractor, str]] = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                now = pd.Timestamp.now()
+                for extractor, station in stations:
+                    key = (extractor.broadcaster, station)
+                    if len(running) < self.workers and key not in self._keys(running) and due[key] <= now and \
+                            (polls is None or counts[key] < polls):
+                        running[executor.submit(self.poll, extractor, station)] = (extractor, station)
+                        counts[key] += 1
+
+                idle = [t for key, t in due.items()
+                        if key not in self._keys(running) and (polls is None or counts[key] < polls)]
+                if not running and not idle:
+                    return
+
+                # wake up when the next idle station is due, or when a poll finished if all workers are busy
+                timeout = None if not idle or len(running) >= self.workers else \
+                    max(0., (min(idle) - pd.Timestamp.now()).total_seconds())
+                if not running:
+                    time.sleep(timeout)
+                    continue
+
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                new_songs = False
+                for future in done:
+                    extractor, station = running.pop(future)
+                    key = (extractor.broadcaster, station)
+                    # the next poll is scheduled from the start of this one, so a station is polled every interval
+                    due[key] = max(due[key] + self.interval, pd.Timestamp.now())
+                    try:
+                        new_songs = not future.result().empty or new_songs
+                    except Exception as e:
+                        self.logger.error(f'Error while polling: {type(e).__name__}: {e}', extra={'station': station})
+
+                if new_songs and self.now_playing_path:
+                    self.write_now_playing()
+                if done and self.metrics_path:
+                    PlaylistExtractor.metrics.write(self.metrics_path)
+
+    @staticmethod
+    def _keys(running: dict[Future, tuple[PlaylistExtractor, str]]) -> set[tuple[str, str]]:
+        return {(extractor.broadcaster, station) for extractor, station in running.values()}
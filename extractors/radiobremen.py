@@ -2,49 +2,47 @@ import io
 from collections.abc import Iterable
 
 import pandas as pd
-import os
 
 from extractors.playlist_extractor import PlaylistExtractor
+from extractors.times import on_date, roll_back
 
 
 class RadiobremenExtractor(PlaylistExtractor):
     broadcaster = 'radiobremen'
     oldest_timestamp = pd.Timestamp(2023, 6, 24)
+    dependent_times = True
     stations = {'bremeneins': 'https://www.bremeneins.de/suche/titelsuche-110~ajax.html',
                 'bremenzwei': 'https://www.bremenzwei.de/musik/titelsuche-106~ajax.html',
                 'bremenvier': 'https://www.bremenvier.de/titelsuche-102~ajax.html',
                 'bremennext': 'https://www.bremennext.de/suche/titelsuche-118~ajax.html'}
 
-    def __init__(self, log=True, sleep_secs=1):
-        super().__init__(log, sleep_secs)
-
-        self.last_timestamp = None
+    def __init__(self, log=True, sleep_secs=1, **kwargs):
+        super().__init__(log, sleep_secs, **kwargs)
 
     def get_times(self, start: pd.Timestamp, end: pd.Timestamp, station: str) -> Iterable[pd.Timestamp]:
-        self.last_timestamp: pd.Timestamp = end
-        while self.last_timestamp > start:
-            yield self.last_timestamp
+        last_timestamp: pd.Timestamp = end
+        while last_timestamp > start:
+            yield last_timestamp
 
-            filepath = os.path.join('raw',
-                                    f'{self.broadcaster}_{station}_{self.last_timestamp.strftime("%Y%m%d-%H%M%S")}.{self.file_extension}')
+            document = self.raw_cache.get(self.broadcaster, station, last_timestamp)
             try:
-                songs = pd.read_html(filepath, flavor='lxml')[0]
+                songs = pd.read_html(io.StringIO(document.decode()), flavor='lxml')[0]
                 last_entry_datetime: pd.Timestamp = pd.to_datetime(
-                    self.last_timestamp.strftime('%Y%m%d') + ' ' + songs.iloc[-1]['Uhrzeit'], format='%Y%m%d %H:%M')
-                request_time = self.last_timestamp.time()
+                    last_timestamp.strftime('%Y%m%d') + ' ' + songs.iloc[-1]['Uhrzeit'], format='%Y%m%d %H:%M')
+                request_time = last_timestamp.time()
                 last_entry_time = last_entry_datetime.time()
 
                 if last_entry_time.hour - request_time.hour > 12:  # rollover to previous day
-                    self.last_timestamp = last_entry_datetime - pd.Timedelta(days=1)
+                    last_timestamp = last_entry_datetime - pd.Timedelta(days=1)
                 elif last_entry_time >= request_time:  # no songs in previous hour
-                    self.last_timestamp -= pd.Timedelta(hours=1)
+                    last_timestamp -= pd.Timedelta(hours=1)
                 elif request_time.hour - last_entry_time.hour > 12:  # no songs in previous hour, and the next song is on a later day
-                    self.last_timestamp -= pd.Timedelta(hours=1)
+                    last_timestamp -= pd.Timedelta(hours=1)
                 else:
-                    self.last_timestamp = last_entry_datetime
+                    last_timestamp = last_entry_datetime
 
             except ValueError:
-                self.last_timestamp -= pd.Timedelta(hours=1)
+                last_timestamp -= pd.Timedelta(hours=1)
 
     def get_url(self, station: str, time):
         date = time.strftime('%Y-%m-%d')
@@ -58,11 +56,8 @@ class RadiobremenExtractor(PlaylistExtractor):
         try:
             df = pd.read_html(io.StringIO(document.decode()), flavor='lxml')[0]
             df.rename(columns={'Uhrzeit': 'time', 'Interpret': 'artist', 'Titel': 'title'}, inplace=True)
-            df['time'] = pd.to_datetime(date.strftime('%Y%m%d') + ' ' + df['time'], format='%Y%m%d %H:%M')
-
-            request_time = date.time()
-            df['time'] = df['time'].apply(
-                lambda time: time if time.time() <= request_time else time - pd.Timedelta(days=1))
+            # the songs after the time of the request were played on the previous day
+            df['time'] = roll_back(on_date(date, df['time']), date)
             df.set_index('time', inplace=True)
 
             return df
@@ -0,0 +1,112 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average and up to `burst` requests at once. A rate of 0 is unlimited."""
+
+    def __init__(self, rate: float, burst: int):
+        self.max_rate: float = rate
+        self.rate: float = rate
+        self.burst: int = burst
+        self.tokens: float = burst
+        self.updated: float = time.monotonic()
+        self.paused_until: float = 0
+        self.failures: int = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if self.rate <= 0:
+            self.tokens = self.burst
+            return
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate if self.rate > 0 else 0)
+
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """Token buckets keyed by host, so all extractors and stations requesting the same host share one budget.
+
+    Failed requests and 429/503 responses pause the host with bounded exponential backoff and jitter (or for the
+    duration given in a Retry-After header) and halve its rate, successful requests slowly restore the rate."""
+
+    def __init__(self, base_backoff: float = 1, max_backoff: float = 300, min_rate: float = 1 / 60):
+        self.base_backoff: float = base_backoff
+        self.max_backoff: float = max_backoff
+        self.min_rate: float = min_rate
+        self.buckets: dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url: str, rate: float, burst: int) -> TokenBucket:
+        """Returns the bucket for the host of the given url. The first caller for a host determines its rate and burst."""
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(rate, burst)
+            return self.buckets[host]
+
+    def acquire(self, url: str, rate: float, burst: int = 1):
+        """Blocks until a request to the host of the given url is allowed"""
+        self.bucket(url, rate, burst).acquire()
+
+    def success(self, url: str):
+        host = urlsplit(url).netloc
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            return
+
+        with bucket.lock:
+            bucket.failures = 0
+            bucket.rate = min(bucket.max_rate, bucket.rate + bucket.max_rate / 10)
+
+    def failure(self, url: str, retry_after: str | None = None) -> float:
+        """Pauses requests to the host of the given url and returns the number of seconds it is paused for"""
+        host = urlsplit(url).netloc
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            return 0
+
+        with bucket.lock:
+            delay = self.retry_after_secs(retry_after)
+            if delay is None:
+                # full jitter: a random delay up to the exponentially growing bound
+                delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** bucket.failures))
+            delay = min(delay, self.max_backoff)
+
+            bucket.failures += 1
+            if bucket.rate > 0:
+                bucket.rate = max(self.min_rate, bucket.rate / 2)
+            bucket.paused_until = max(bucket.paused_until, time.monotonic() + delay)
+
+        return delay
+
+    @staticmethod
+    def retry_after_secs(retry_after: str | None) -> float | None:
+        """Parses the value of a Retry-After header, which is either a number of seconds or an HTTP date"""
+        if not retry_after:
+            return None
+
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,230 @@
+import glob
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from typing import NamedTuple
+
+import pandas as pd
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class RawEntry(NamedTuple):
+    time: pd.Timestamp
+    path: str
+    size: int
+    status: int | None
+    hash: str | None
+    fetched_at: pd.Timestamp
+    etag: str | None = None  # validators of the response, sent with the next request for the document
+    last_modified: str | None = None
+
+
+class RawCache:
+    """Stores downloaded documents in the raw folder and keeps a manifest of them in an SQLite database, so finding the
+    documents of a station in a time range is an indexed query instead of a scan of the folder.
+
+    A document is downloaded again if it was fetched less than `refetch_within` after its timestamp (because the
+    broadcaster might have added songs afterwards) or, if `refetch_bad_status` is set, if its status code was not 200.
+    """
+
+    def __init__(self, directory: str = 'raw', refetch_within: pd.Timedelta = pd.Timedelta(days=1),
+                 refetch_bad_status: bool = True):
+        self.directory: str = directory
+        self.refetch_within: pd.Timedelta = refetch_within
+        self.refetch_bad_status: bool = refetch_bad_status
+
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(os.path.join(directory, 'manifest.sqlite'), timeout=60,
+                                          check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS documents (broadcaster TEXT, station TEXT, time TEXT, '
+                                    'path TEXT, size INTEGER, status INTEGER, hash TEXT, fetched_at TEXT, '
+                                    'PRIMARY KEY (broadcaster, station, time))')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS indexed_stations (broadcaster TEXT, station TEXT, '
+                                    'PRIMARY KEY (broadcaster, station))')
+
+            # manifests created before the validators were stored
+            columns = [row[1] for row in self.connection.execute('PRAGMA table_info(documents)')]
+            for column in ('etag', 'last_modified'):
+                if column not in columns:
+                    self.connection.execute(f'ALTER TABLE documents ADD COLUMN {column} TEXT')
+
+    def path(self, broadcaster: str, station: str, time: pd.Timestamp, extension: str) -> str:
+        return os.path.join(self.directory, f'{broadcaster}_{station}_{time.strftime("%Y%m%d-%H%M%S")}.{extension}')
+
+    def entries(self, broadcaster: str, station: str, start: pd.Timestamp,
+                end: pd.Timestamp) -> dict[pd.Timestamp, RawEntry]:
+        """Returns the manifest entries of all documents of a station between start and end (inclusive)"""
+        self._index_existing_files(broadcaster, station)
+        with self.lock:
+            rows = self.connection.execute('SELECT time, path, size, status, hash, fetched_at, etag, last_modified '
+                                           'FROM documents '
+                                           'WHERE broadcaster = ? AND station = ? AND time BETWEEN ? AND ? '
+                                           'ORDER BY time',
+                                           (broadcaster, station, start.strftime(TIME_FORMAT),
+                                            end.strftime(TIME_FORMAT))).fetchall()
+
+        entries = [self._entry(row) for row in rows]
+        return {e.time: e for e in entries}
+
+    def entry(self, broadcaster: str, station: str, time: pd.Timestamp) -> RawEntry | None:
+        return self.entries(broadcaster, station, time, time).get(time)
+
+    def is_stale(self, entry: RawEntry) -> bool:
+        """Returns whether a document has to be downloaded again"""
+        if not os.path.isfile(entry.path):  # the raw folder may be emptied by the user
+            return True
+        if self.refetch_bad_status and entry.status not in (None, 200):
+            return True
+        return entry.fetched_at - entry.time < self.refetch_within
+
+    def conditional_headers(self, entry: RawEntry | None) -> dict[str, str]:
+        """Returns the headers which make the server answer 304 Not Modified if the saved document is still current"""
+        if entry is None or entry.status != 200 or not entry.hash or not os.path.isfile(entry.path):
+            return {}
+
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def put(self, broadcaster: str, station: str, time: pd.Timestamp, extension: str, content: bytes,
+            status: int | None = None, etag: str | None = None, last_modified: str | None = None,
+            previous: RawEntry | None = None) -> RawEntry:
+        """Saves a downloaded document and adds it to the manifest. If it is identical to the previous document for the
+        same timestamp, only the manifest entry is updated."""
+        content_hash = hashlib.sha256(content).hexdigest()
+        if previous is not None and previous.hash == content_hash and os.path.isfile(previous.path):
+            path = previous.path
+        else:
+            path = self._write(broadcaster, station, time, extension, content, content_hash)
+
+        entry = RawEntry(time, path, len(content), status, content_hash, pd.Timestamp.now(), etag, last_modified)
+        self._insert(broadcaster, station, [entry])
+        return entry
+
+    def revalidate(self, broadcaster: str, station: str, entry: RawEntry, etag: str | None = None,
+                   last_modified: str | None = None) -> RawEntry:
+        """Marks a saved document as current after the server answered 304 Not Modified"""
+        entry = entry._replace(fetched_at=pd.Timestamp.now(), etag=etag or entry.etag,
+                               last_modified=last_modified or entry.last_modified)
+        self._insert(broadcaster, station, [entry])
+        return entry
+
+    def get(self, broadcaster: str, station: str, time: pd.Timestamp) -> bytes:
+        """Returns the saved document of a station for the given timestamp"""
+        entry = self.entry(broadcaster, station, time)
+        if entry is None:
+            raise FileNotFoundError(f'No document of {broadcaster}_{station} saved for {time}')
+
+        return self._read(entry)
+
+    def _write(self, broadcaster: str, station: str, time: pd.Timestamp, extension: str, content: bytes,
+               content_hash: str) -> str:
+        """Saves the content of a document and returns the path of the file containing it"""
+        path = self.path(broadcaster, station, time, extension)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def _read(self, entry: RawEntry) -> bytes:
+        with open(entry.path, 'rb') as f:
+            return f.read()
+
+    def _insert(self, broadcaster: str, station: str, entries: list[RawEntry]):
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO documents (broadcaster, station, time, path, size, '
+                                        'status, hash, fetched_at, etag, last_modified) '
+                                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                        [(broadcaster, station, e.time.strftime(TIME_FORMAT), e.path, e.size,
+                                          e.status, e.hash, e.fetched_at.strftime(TIME_FORMAT), e.etag,
+                                          e.last_modified) for e in entries])
+
+    def _index_existing_files(self, broadcaster: str, station: str):
+        """Adds the files downloaded before the manifest existed, once per station"""
+        with self.lock:
+            indexed = self.connection.execute('SELECT 1 FROM indexed_stations WHERE broadcaster = ? AND station = ?',
+                                              (broadcaster, station)).fetchone()
+        if indexed:
+            return
+
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, f'{broadcaster}_{station}_*')):
+            time = pd.to_datetime(path.split('_')[-1].split('.')[0], format='%Y%m%d-%H%M%S', errors='coerce')
+            if pd.isna(time):
+                continue
+
+            stat = os.stat(path)
+            entries.append(RawEntry(time, path, stat.st_size, None, None, pd.Timestamp.fromtimestamp(stat.st_mtime)))
+
+        self._insert(broadcaster, station, entries)
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR IGNORE INTO indexed_stations VALUES (?, ?)', (broadcaster, station))
+
+    @staticmethod
+    def _entry(row: tuple) -> RawEntry:
+        time, path, size, status, content_hash, fetched_at, etag, last_modified = row
+        return RawEntry(pd.Timestamp(time), path, size, status, content_hash, pd.Timestamp(fetched_at), etag,
+                        last_modified)
+
+
+class PackedRawCache(RawCache):
+    """Raw cache which compresses documents with zlib and stores each distinct document only once, identified by its
+    hash. Documents are appended to one segment file per station and month ({broadcaster}_{station}_{YYYY-MM}.segment)
+    instead of one file per request. Documents saved as single files by RawCache can still be read."""
+
+    def __init__(self, directory: str = 'raw', refetch_within: pd.Timedelta = pd.Timedelta(days=1),
+                 refetch_bad_status: bool = True, compression_level: int = 6):
+        super().__init__(directory, refetch_within, refetch_bad_status)
+        self.compression_level: int = compression_level
+        self.segment_lock = threading.Lock()
+
+        with self.lock, self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, segment TEXT, '
+                                    'offset INTEGER, length INTEGER)')
+
+    def segment_path(self, broadcaster: str, station: str, time: pd.Timestamp) -> str:
+        return os.path.join(self.directory, f'{broadcaster}_{station}_{time.strftime("%Y-%m")}.segment')
+
+    def _blob(self, content_hash: str) -> tuple[str, int, int] | None:
+        with self.lock:
+            return self.connection.execute('SELECT segment, offset, length FROM blobs WHERE hash = ?',
+                                           (content_hash,)).fetchone()
+
+    def _write(self, broadcaster: str, station: str, time: pd.Timestamp, extension: str, content: bytes,
+               content_hash: str) -> str:
+        blob = self._blob(content_hash)
+        if blob is not None:
+            return blob[0]
+
+        segment = self.segment_path(broadcaster, station, time)
+        compressed = zlib.compress(content, self.compression_level)
+        with self.segment_lock:
+            with open(segment, 'ab') as f:
+                offset = f.tell()
+                f.write(compressed)
+
+            # the blob is only added after it has been written completely, so a crash leaves unreferenced bytes at most
+            with self.lock, self.connection:
+                self.connection.execute('INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?)',
+                                        (content_hash, segment, offset, len(compressed)))
+
+        return segment
+
+    def _read(self, entry: RawEntry) -> bytes:
+        blob = self._blob(entry.hash) if entry.hash else None
+        if blob is None:
+            return super()._read(entry)
+
+        segment, offset, length = blob
+        with open(segment, 'rb') as f:
+            f.seek(offset)
+            return zlib.decompress(f.read(length))
@@ -1,11 +1,13 @@
 import io
-import time
+from collections.abc import Iterable, Iterator
 
 import pandas as pd
-from bs4 import BeautifulSoup
 from six import StringIO
 
+from extractors.discovery import DiscoveryIndex
+from extractors.html_parser import parse_html
 from extractors.playlist_extractor import PlaylistExtractor
+from extractors.times import EPOCH, on_date
 
 
 class RbbExtractor(PlaylistExtractor):
@@ -20,48 +22,85 @@ class RbbExtractor(PlaylistExtractor):
                 'fritz': 'https://www.fritz.de/programm/sendungen/playlists/index.htm/',
                 'radioeins': 'https://www.radioeins.de/musik/playlists.htm/',
                 'radiodrei': 'https://www.radiodrei.de/musik/musiklisten/index.htm/'}
+    html_parser = 'lxml'  # extracts the same DataFrames as BeautifulSoup, see tests/test_html_parser.py
+
+    # The times of the playlist finder stations don't depend on the playlists, so the index pages are crawled while the
+    # playlists found so far are downloaded. finder_window is the time range whose index pages are crawled at once.
+    dependent_times = {'fritz': False, 'radioeins': False, 'radiodrei': False}
+    finder_window = pd.Timedelta(days=7)
+
+    def __init__(self, log=True, sleep_secs=1, discovery: DiscoveryIndex | None = None, **kwargs):
+        super().__init__(log, sleep_secs, **kwargs)
+        # urls of the playlists found by the playlist finder, opened on first use
+        self._discovery: DiscoveryIndex | None = discovery
+
+    @property
+    def discovery(self) -> DiscoveryIndex:
+        with self.lazy_lock:
+            if self._discovery is None:
+                self._discovery = DiscoveryIndex(self.storage.directory)
+            return self._discovery
+
+    def get_times(self, start, end, station) -> Iterable[pd.Timestamp]:
+        if station in ['888', 'antenne-brandenburg']:
+            return pd.date_range(start, end, freq='1h')
 
-    def __init__(self, log=True, sleep_secs=1):
-        super().__init__(log, sleep_secs)
-        self.times = None
+        return self._finder_times(start, end, station)
 
-    def get_times(self, start, end, station) -> pd.DatetimeIndex:
-        log_extra = {'station': station}
+    def _finder_times(self, start: pd.Timestamp, end: pd.Timestamp, station: str) -> Iterator[pd.Timestamp]:
+        """Yields the times of the playlists between start and end in chronological order, crawling the parts of the
+        playlist finder which are not in the discovery index yet in steps of finder_window"""
+        t = start
+        while t <= end:
+            window_end = min(t + self.finder_window, end)
+            for gap_start, gap_end in self.discovery.gaps(self.broadcaster, station, t, window_end):
+                self._crawl(gap_start, gap_end, station)
 
-        if station in ['888', 'antenne-brandenburg']:
-            return pd.date_range(start, end, freq='1h')
+            yield from self.discovery.urls(self.broadcaster, station, t, window_end)
+            t = window_end + pd.Timedelta(seconds=1)
 
-        self.times = {}
+    def _crawl(self, start: pd.Timestamp, end: pd.Timestamp, station: str):
+        """Pages through the playlist finder backwards from end to start and adds the playlists to the discovery
+        index. A time range reaching the present is only recorded as crawled up to its newest playlist, so the next
+        crawl continues from there.
+
+        If a page can't be downloaded, a RuntimeError is raised and the range is not recorded, so its time window fails
+        (and isn't marked as complete in the journal) and the range is crawled again by the next update."""
+        log_extra = {'station': station}
+        crawled_at = pd.Timestamp.now()
+        newest = None
+
+        page_end = end
         while True:
             start_str = start.strftime('%d-%m-%Y_%H-%M')
-            end_str = end.strftime('%d-%m-%Y_%H-%M')
+            end_str = page_end.strftime('%d-%m-%Y_%H-%M')
             url = self.stations[station] + f'from={start_str}/module=playlistfinder/to={end_str}.html'
 
             self.logger.info(f'get_times: Downloading {url}', extra=log_extra)
-            soup = BeautifulSoup(self.session.get(url).content, 'html.parser')
+            response = self.request_with_retries(station, url, description=f'playlist finder page {url}')
+            if response.status_code != 200:
+                raise RuntimeError(f'Playlist finder between {start} and {end} could not be crawled: {url} returned '
+                                   f'{response.status_code} {response.reason}')
+            soup = parse_html(response.content, self.html_parser)
 
             urls = [f'https://www.{station}.de{e.find("a")["href"]}' for e in
                     soup.find_all(class_='play_time' if station == 'radioeins' else 'begin')]
             if not urls:
                 break
 
-            times = list(
-                pd.to_datetime([e.split('/')[-1].split('.')[0].ljust(13, '0') for e in urls], format='%y%m%d_%H%M%S'))
-            seen = set()
-            for i, e in enumerate(times):
-                if e in seen:
-                    while e in times or e in self.times:
-                        e = e.replace(second=e.second + 1)
-                    times[i] = e
-                else:
-                    seen.add(e)
+            times = pd.to_datetime([e.split('/')[-1].split('.')[0].ljust(13, '0') for e in urls],
+                                   format='%y%m%d_%H%M%S')
+            self.discovery.add(self.broadcaster, station, zip(times, urls))
 
-            self.times.update(dict(zip(times, urls)))
-
-            end = sorted(times)[0]
-            time.sleep(self.sleep_secs)
+            newest = max(newest, times.max()) if newest is not None else times.max()
+            if times.min() >= page_end:
+                break
+            page_end = times.min()
 
-        return pd.DatetimeIndex(sorted(self.times.keys()))
+        if end < crawled_at:
+            self.discovery.mark_crawled(self.broadcaster, station, start, end)
+        elif newest is not None and newest >= start:
+            self.discovery.mark_crawled(self.broadcaster, station, start, newest)
 
     def get_url(self, station: str, time):
         if station in ['888', 'antenne-brandenburg']:
@@ -72,7 +111,7 @@ class RbbExtractor(PlaylistExtractor):
 
             return f'https://playlisten.rbb-online.de/{self.stations[station]}/main/anzeige.php', form
 
-        return self.times[time], {}
+        return self.discovery.url(self.broadcaster, station, time), {}
 
     def extract(self, station: str, document: bytes, date) -> pd.DataFrame:
         log_extra = {'station': station}
@@ -88,7 +127,7 @@ class RbbExtractor(PlaylistExtractor):
             df.rename(columns={'Titel': 'title', 'Interpret': 'artist'}, inplace=True)
             return df
 
-        soup = BeautifulSoup(document, 'html.parser').find(class_='playlist_tables')
+        soup = parse_html(document, self.html_parser).find(class_='playlist_tables')
         playlist = soup.find(class_='playlist_aktueller_tag')
         if not playlist:
             self.logger.warning(f'No playlist data found for {date}', extra=log_extra)
@@ -109,9 +148,7 @@ class RbbExtractor(PlaylistExtractor):
             if time.second == 0:
                 time = time.replace(second=24)
 
-            times = pd.to_datetime(df.pop('Zeit'), format='%H:%M').fillna(time)
-            df.index = pd.to_datetime(date.strftime('%Y%m%d') + ' ' + times.dt.strftime('%H%M%S'),
-                                      format='%Y%m%d %H%M%S')
+            df.index = pd.Index(on_date(date, df.pop('Zeit'), default=time), name='time')
             df.rename(columns={'Titel': 'title', 'Künstler.1': 'artist'}, inplace=True)
         elif station == 'radioeins':
             playlist_startstop = soup.find(class_='playlisttime').text.split(' - ')
@@ -131,9 +168,7 @@ class RbbExtractor(PlaylistExtractor):
 
             for row in playlist.find_all('tr'):
                 if 'play_track' in row['class']:
-                    play_time = pd.to_datetime(row.find(class_='play_time').text, format='%H:%M')
-                    times.append(date.strftime('%Y%m%d') + ' ' + (
-                        play_time.strftime('%H%M%S') if pd.notna(play_time) else playlist_time.strftime('%H%M%S')))
+                    times.append(row.find(class_='play_time').text)
 
                     title = row.find('span', class_='tracktitle')
                     titles.append(title.text if title else '')
@@ -146,7 +181,7 @@ class RbbExtractor(PlaylistExtractor):
                 'artist': artists,
                 'title': titles,
                 'album': albums
-            }, index=pd.Series(data=pd.to_datetime(times, format='%Y%m%d %H%M%S'), name='time'),
+            }, index=pd.Series(data=on_date(date, times, default=playlist_time), name='time'),
                 dtype=str)
         else:
             playlist_startstop = soup.find(class_='playlisttime').text.split(' - ')
@@ -173,7 +208,7 @@ class RbbExtractor(PlaylistExtractor):
                     except ValueError:
                         self.logger.warning(f'No time found in fond row for {date}', extra=log_extra)
                 elif 'play_track' in row['class']:
-                    times.append(date.strftime('%Y%m%d') + ' ' + time.strftime('%H:%M'))
+                    times.append(time)
 
                     composer = row.find('span', class_='trackkomponist')
                     composers.append(composer.text if composer else '')
@@ -186,13 +221,14 @@ class RbbExtractor(PlaylistExtractor):
                     duration = row.find(class_='tracklength')
                     durations.append(duration.text if duration else '')
 
+            # the seconds of the playlist start encode its end, they are not part of the times of the songs
             df = pd.DataFrame({
                 'artist': artists,
                 'title': titles,
                 'composer': composers,
                 'album': albums,
                 'duration': durations
-            }, index=pd.Series(data=pd.to_datetime(times, format='%Y%m%d %H:%M'), name='time'),
+            }, index=pd.Series(data=date.normalize() + (pd.DatetimeIndex(times).floor('min') - EPOCH), name='time'),
                 dtype=str)
 
         return df
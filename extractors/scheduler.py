@@ -0,0 +1,192 @@
+import sys
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import NamedTuple
+
+import pandas as pd
+from tqdm.auto import tqdm
+
+from extractors.playlist_extractor import PlaylistExtractor
+
+
+class Task(NamedTuple):
+    deadline: pd.Timestamp
+    start: pd.Timestamp
+    end: pd.Timestamp
+    extractor: PlaylistExtractor
+    station: str
+    number: int  # position of the window in the time range of the station
+
+
+class Scheduler:
+    """Updates the stations of several extractors on one pool of workers.
+
+    The time range of every station is split into windows of its extractor's schedule_window, and each window is a
+    task. Tasks run in the order of their deadline, the time when the broadcaster deletes the oldest data of the window
+    (see oldest_timestamp), so data which is about to disappear is downloaded first and a long backfill doesn't keep the
+    other stations waiting. At most max_tasks_per_broadcaster tasks of a broadcaster run at the same time (requests to a
+    single host are additionally limited by PlaylistExtractor.max_requests_per_host).
+
+    The windows of a station are stored in chronological order and recorded in the extractor's journal, so an
+    interrupted update continues after the newest stored row or completed window without leaving gaps. The batches of
+    the oldest window of a station which hasn't been stored yet are stored as soon as they are extracted, only the
+    batches of later windows are kept in memory until it is their turn. At most windows_per_station windows of a
+    station are running or waiting to be stored at the same time."""
+
+    def __init__(self, extractors: list[PlaylistExtractor], workers: int = 8, max_tasks_per_broadcaster: int = 2,
+                 windows_per_station: int = 2):
+        self.extractors: list[PlaylistExtractor] = extractors
+        self.workers: int = workers
+        self.max_tasks_per_broadcaster: int = max_tasks_per_broadcaster
+        self.windows_per_station: int = windows_per_station
+        self.logger = PlaylistExtractor.logger
+
+    @staticmethod
+    def deadline(extractor: PlaylistExtractor, station: str, time: pd.Timestamp | pd.DatetimeIndex) -> pd.Timestamp:
+        """Returns the time when the broadcaster deletes the data of the given time(s) (Timestamp.max if never)"""
+        oldest = extractor.oldest_timestamp
+        if isinstance(oldest, dict):
+            oldest = oldest[station]
+
+        return time + oldest if isinstance(oldest, pd.Timedelta) else pd.Timestamp.max
+
+    def plan(self) -> dict[tuple[str, str], list[Task]]:
+        """Splits the time range of every station into windows and returns the tasks of each station in chronological
+        order"""
+        tasks = {}
+        for extractor in self.extractors:
+            for station in extractor.stations:
+                start, end = extractor.update_range(station)
+                edges = list(pd.date_range(start, end, freq=extractor.schedule_window))
+                if edges[-1] < end or len(edges) == 1:
+                    edges.append(end)
+
+                windows = []
+                for i, (window_start, window_end) in enumerate(zip(edges[:-1], edges[1:])):
+                    # the windows don't overlap, so no timestamp is requested twice
+                    if i < len(edges) - 2:
+                        window_end -= pd.Timedelta(seconds=1)
+                    windows.append(Task(self.deadline(extractor, station, window_start), window_start, window_end,
+                                        extractor, station, i))
+
+                tasks[(extractor.broadcaster, station)] = windows
+
+        return tasks
+
+    def report(self, requests_per_second: float | None = None,
+               within: pd.Timedelta = pd.Timedelta(days=1)) -> pd.DataFrame:
+        """Returns the hours which haven't been downloaded yet in the order of their deadline, with the time when the
+        broadcaster deletes them. An hour is at risk if it is deleted within the given time or, if a network budget of
+        requests_per_second (one request per hour) is given, before the more urgent hours could be downloaded.
+
+        Hours ending at or before the newest stored row and hours with a document in the raw cache which doesn't have
+        to be downloaded again are not included, even if they are part of the time range of the next update."""
+        now = pd.Timestamp.now()
+        hours = []
+        for windows in self.plan().values():
+            extractor, station = windows[0].extractor, windows[0].station
+            times = pd.DatetimeIndex([t for task in windows for t in pd.date_range(task.start, task.end, freq='1h')])
+
+            last_timestamp = extractor.storage.last_timestamp(extractor.broadcaster, station)
+            if last_timestamp is not None:
+                times = times[times + pd.Timedelta(hours=1) > last_timestamp]
+            cached = extractor.raw_cache.entries(extractor.broadcaster, station, windows[0].start, windows[-1].end)
+            fresh = pd.DatetimeIndex([t for t, entry in cached.items() if not extractor.raw_cache.is_stale(entry)])
+            times = times[~times.isin(fresh.floor('1h'))]
+
+            hours.append(pd.DataFrame({'broadcaster': extractor.broadcaster, 'station': station, 'hour': times,
+                                       'deadline': self.deadline(extractor, station, times)}))
+        if not hours:
+            return pd.DataFrame(columns=['broadcaster', 'station', 'hour', 'deadline', 'eta', 'at_risk'])
+
+        df = pd.concat(hours).sort_values(['deadline', 'hour'], kind='stable', ignore_index=True)
+        df = df[df['hour'] < now]
+        df['eta'] = pd.NaT
+        if requests_per_second:
+            df['eta'] = now + pd.to_timedelta((pd.RangeIndex(len(df)) + 1) / requests_per_second, unit='s')
+        df['at_risk'] = (df['deadline'] <= now + within) | (df['deadline'] <= df['eta'])
+
+        return df.reset_index(drop=True)
+
+    def run(self):
+        tasks = self.plan()
+        waiting = {key: deque(windows) for key, windows in tasks.items()}
+        stored = {key: 0 for key in tasks}  # number of windows stored per station
+        downloaded: dict[tuple[str, str], set[int]] = defaultdict(set)
+        # batches of windows which were extracted before the previous windows of their station had been stored
+        buffered: dict[tuple[str, str], dict[int, list[pd.DataFrame]]] = defaultdict(lambda: defaultdict(list))
+        locks = {key: threading.Lock() for key in tasks}
+        running: dict[Future, Task] = {}
+        running_per_broadcaster: dict[str, int] = defaultdict(int)
+        failed = set()
+
+        def download(task: Task):
+            key = (task.extractor.broadcaster, task.station)
+            for new_data in task.extractor.stream(task.station, task.start, task.end, pbar, skip_unchanged=True):
+                with locks[key]:
+                    if key in failed:
+                        return
+                    if stored[key] == task.number:
+                        task.extractor.store(task.station, new_data, (task.start, task.end))
+                    else:
+                        buffered[key][task.number].append(new_data)
+
+        total = sum((t.end - t.start) // pd.Timedelta(minutes=1) for windows in tasks.values() for t in windows)
+        with tqdm(file=sys.stdout, total=total, leave=False, unit='h', unit_scale=1 / 60, desc='All stations',
+                  bar_format='{desc:<30.30}{percentage:3.0f}%|{bar:40}| {n:.0f}/{total:.0f} '
+                             '[{elapsed}<{remaining}, {rate_fmt}{postfix}]') as pbar, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for windows in tasks.values():
+                windows[0].extractor.prepare_station(windows[0].station)
+
+            while waiting or running:
+                # the next window of each station is a candidate, the most urgent ones are started first
+                candidates = sorted((queue[0] for queue in waiting.values()), key=lambda t: (t.deadline, t.start))
+                for task in candidates:
+                    key = (task.extractor.broadcaster, task.station)
+                    if len(running) >= self.workers:
+                        break
+                    if running_per_broadcaster[task.extractor.broadcaster] >= self.max_tasks_per_broadcaster or \
+                            task.number >= stored[key] + self.windows_per_station:
+                        continue
+
+                    waiting[key].popleft()
+                    if not waiting[key]:
+                        del waiting[key]
+                    running[executor.submit(download, task)] = task
+                    running_per_broadcaster[task.extractor.broadcaster] += 1
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    key = (task.extractor.broadcaster, task.station)
+                    running_per_broadcaster[task.extractor.broadcaster] -= 1
+                    if key in failed:
+                        continue
+
+                    try:
+                        future.result()
+                    except Exception as e:
+                        # later windows can't be stored without leaving a gap, the next update retries them
+                        self.logger.error(f'Error while updating {task.start} - {task.end}: {type(e).__name__}: {e}',
+                                          extra={'station': task.station})
+                        waiting.pop(key, None)
+                        with locks[key]:
+                            buffered.pop(key, None)
+                            failed.add(key)
+                        continue
+
+                    with locks[key]:
+                        downloaded[key].add(task.number)
+                        while stored[key] in downloaded[key]:
+                            window = tasks[key][stored[key]]
+                            task.extractor.journal.complete(task.extractor.broadcaster, task.station, window.start,
+                                                            window.end)
+                            stored[key] += 1
+
+                            # the next window is stored directly from now on
+                            if stored[key] < len(tasks[key]):
+                                window = tasks[key][stored[key]]
+                                for new_data in buffered[key].pop(stored[key], []):
+                                    task.extractor.store(task.station, new_data, (window.start, window.end))
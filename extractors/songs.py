@@ -0,0 +1,169 @@
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+SONG_COLUMNS = ('artist', 'title')
+
+FEATURING_PATTERN = r'[\s(\[]*\b(?:featuring|feat|ft)\b\.?\s*'
+# separators between several artists, e.g. '; ' on sr2, ' & ' or ' und ' on other stations
+ARTIST_SEPARATOR_PATTERN = r'\s*[;/]\s*|\s+(?:&|\+|x|and|und|vs\.?)\s+'
+
+
+def normalise(values: pd.Series, artist: bool = False) -> pd.Series:
+    """Folds the spellings of an artist or title into a key which is equal for all of them: removes diacritics,
+    case and redundant whitespace and unifies featuring (and for artists the separators between several artists).
+
+    Only the distinct values are normalised, so this is cheap for columns with many repetitions."""
+    uniques = pd.Series(values.dropna().unique(), dtype=str)
+    keys = (uniques.str.normalize('NFKD')
+            .str.replace('[\u0300-\u036f]', '', regex=True)  # combining diacritical marks
+            .str.casefold()
+            .str.replace(FEATURING_PATTERN, ' feat. ', regex=True)
+            .str.replace(r'[)\]]', '', regex=True))
+    if artist:
+        keys = keys.str.replace(ARTIST_SEPARATOR_PATTERN, ', ', regex=True)
+    keys = keys.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+    return values.map(dict(zip(uniques, keys))).astype(str)
+
+
+class SongDictionary:
+    """Global dictionary of the artists, titles and songs of all stations, stored in an SQLite database.
+
+    Every distinct spelling of an artist or title gets an integer ID, so playlists can be stored as IDs without losing
+    the original spelling. Spellings with the same normalised key (see normalise) share a key ID, and each pair of
+    artist and title key is a song with its own song ID, which identifies a song across all stations."""
+
+    def __init__(self, path: str = os.path.join('data', 'songs.sqlite')):
+        self.path: str = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS keys (id INTEGER PRIMARY KEY, kind TEXT, key TEXT, '
+                                    'UNIQUE (kind, key))')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS names (id INTEGER PRIMARY KEY, kind TEXT, name TEXT, '
+                                    'key_id INTEGER, UNIQUE (kind, name))')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS names_key_id ON names (key_id)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS songs (id INTEGER PRIMARY KEY, artist_key INTEGER, '
+                                    'title_key INTEGER, UNIQUE (artist_key, title_key))')
+
+        # IDs never change, so known IDs are cached. New ones are always assigned by the database, which keeps them
+        # unique when several instances or processes use the same dictionary.
+        self.name_ids: dict[str, dict[str, int]] = {kind: {} for kind in SONG_COLUMNS}
+        self.names: dict[int, str] = {}
+        self.name_keys: dict[int, int] = {}
+        self.song_ids_by_keys: dict[tuple[int, int], int] = {}
+
+    def encode(self, kind: str, values: pd.Series) -> pd.Series:
+        """Returns the ID of each artist or title (kind) in values, adding new spellings to the dictionary"""
+        known = self.name_ids[kind]
+        new = [v for v in values.dropna().unique() if v not in known]
+        if new:
+            new_keys = normalise(pd.Series(new, dtype=str), artist=kind == 'artist')
+            with self.lock, self.connection:
+                self.connection.executemany('INSERT OR IGNORE INTO keys (kind, key) VALUES (?, ?)',
+                                            [(kind, k) for k in new_keys.unique()])
+                self.connection.executemany('INSERT OR IGNORE INTO names (kind, name, key_id) '
+                                            'SELECT ?, ?, id FROM keys WHERE kind = ? AND key = ?',
+                                            [(kind, name, kind, key) for name, key in zip(new, new_keys)])
+            self._load_names(kind, new)
+
+        return values.map(known).astype('Int32')
+
+    def decode(self, ids: pd.Series) -> pd.Series:
+        """Returns the spellings of the given IDs as a categorical"""
+        uniques = pd.Index(ids.dropna().unique())
+        self._load_ids([int(i) for i in uniques if int(i) not in self.names])
+        categories = pd.Index([self.names[int(i)] for i in uniques], dtype=str)
+        codes = uniques.get_indexer(ids.astype('Int64').fillna(-1))
+        return pd.Series(pd.Categorical.from_codes(codes, categories), index=ids.index, name=ids.name)
+
+    def song_ids(self, artist_ids: pd.Series, title_ids: pd.Series) -> pd.Series:
+        """Returns the song ID of each pair of artist and title ID, adding new songs to the dictionary"""
+        self._load_ids([int(i) for i in pd.concat([artist_ids, title_ids]).dropna().unique()
+                        if int(i) not in self.name_keys])
+        artist_keys = artist_ids.map(self.name_keys)
+        title_keys = title_ids.map(self.name_keys)
+        keys = pd.DataFrame({'artist': artist_keys, 'title': title_keys}).dropna().astype(int)
+        pairs = list(dict.fromkeys(zip(keys['artist'], keys['title'])))
+
+        new = [p for p in pairs if p not in self.song_ids_by_keys]
+        if new:
+            with self.lock, self.connection:
+                self.connection.executemany('INSERT OR IGNORE INTO songs (artist_key, title_key) VALUES (?, ?)', new)
+            with self.lock:
+                for p in new:
+                    self.song_ids_by_keys[p] = self.connection.execute(
+                        'SELECT id FROM songs WHERE artist_key = ? AND title_key = ?', p).fetchone()[0]
+
+        song_ids = [self.song_ids_by_keys.get((int(a), int(t))) if pd.notna(a) and pd.notna(t) else None
+                    for a, t in zip(artist_keys, title_keys)]
+        return pd.Series(song_ids, index=artist_ids.index, dtype='Int32', name='song_id')
+
+    def songs(self, song_ids: list[int] | None = None) -> pd.DataFrame:
+        """Returns the given songs (or all songs) indexed by song ID, with the first seen spelling and the normalised
+        key of their artist and title"""
+        query = ('SELECT songs.id AS song_id, '
+                 '(SELECT name FROM names WHERE key_id = songs.artist_key ORDER BY id LIMIT 1) AS artist, '
+                 '(SELECT name FROM names WHERE key_id = songs.title_key ORDER BY id LIMIT 1) AS title, '
+                 'a.key AS artist_key, t.key AS title_key FROM songs '
+                 'JOIN keys a ON a.id = songs.artist_key JOIN keys t ON t.id = songs.title_key')
+        if song_ids is None:
+            with self.lock:
+                return pd.read_sql(query, self.connection, index_col='song_id')
+
+        frames = []
+        for i in range(0, len(song_ids), 500):
+            chunk = [int(song_id) for song_id in song_ids[i:i + 500]]
+            with self.lock:
+                frames.append(pd.read_sql(f'{query} WHERE songs.id IN ({", ".join("?" * len(chunk))})',
+                                          self.connection, params=chunk, index_col='song_id'))
+        if not frames:
+            return pd.DataFrame(columns=['artist', 'title', 'artist_key', 'title_key'],
+                                index=pd.Index([], name='song_id'))
+        return pd.concat(frames)
+
+    def encode_playlist(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Replaces the artist and title columns of a playlist with the columns artist_id and title_id"""
+        df = df.copy()
+        for kind in SONG_COLUMNS:
+            if kind in df.columns:
+                df[kind] = self.encode(kind, df[kind])
+                df.rename(columns={kind: f'{kind}_id'}, inplace=True)
+        return df
+
+    def decode_playlist(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Reverses encode_playlist, the artist and title columns are returned as categoricals"""
+        df = df.copy()
+        for kind in SONG_COLUMNS:
+            if f'{kind}_id' in df.columns:
+                df[f'{kind}_id'] = self.decode(df[f'{kind}_id'])
+                df.rename(columns={f'{kind}_id': kind}, inplace=True)
+        return df
+
+    def _load_names(self, kind: str, names: list[str]):
+        for i in range(0, len(names), 500):  # SQLite limits the number of parameters of a query
+            chunk = names[i:i + 500]
+            with self.lock:
+                rows = self.connection.execute(f'SELECT id, name, key_id FROM names WHERE kind = ? AND name IN '
+                                               f'({", ".join("?" * len(chunk))})', [kind] + chunk).fetchall()
+            self._cache(kind, rows)
+
+    def _load_ids(self, ids: list[int]):
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            with self.lock:
+                rows = self.connection.execute(f'SELECT kind, id, name, key_id FROM names WHERE id IN '
+                                               f'({", ".join("?" * len(chunk))})', chunk).fetchall()
+            for kind, *row in rows:
+                self._cache(kind, [row])
+
+    def _cache(self, kind: str, rows: list[tuple[int, str, int]]):
+        for name_id, name, key_id in rows:
+            self.name_ids[kind][name] = name_id
+            self.names[name_id] = name
+            self.name_keys[name_id] = key_id
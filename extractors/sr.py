@@ -1,7 +1,8 @@
 import pandas as pd
-from bs4 import BeautifulSoup
 
+from extractors.html_parser import parse_html
 from extractors.playlist_extractor import PlaylistExtractor
+from extractors.times import on_date
 
 
 class SrExtractor(PlaylistExtractor):
@@ -10,9 +11,17 @@ class SrExtractor(PlaylistExtractor):
                         'sr2': pd.Timedelta(days=13),
                         'sr3': pd.Timedelta(days=3)}
     stations = ['sr1', 'sr2', 'sr3']
+    html_parser = 'bs4'  # the handling of the malformed sr2 pages relies on the tree built by html.parser
 
-    def __init__(self, log=True, sleep_secs=1):
-        super().__init__(log, sleep_secs)
+    def __init__(self, log=True, sleep_secs=1, **kwargs):
+        super().__init__(log, sleep_secs, **kwargs)
+
+    @staticmethod
+    def is_malformed(soup) -> bool:
+        """Returns whether an sr2 page contains the incorrect html which puts several entries into one element"""
+        title_lengths = [len(content.find_all(class_='musicResearch__Item__Content__Title'))
+                         for content in soup.find_all(class_='musicResearch__Item__Content')]
+        return any([x > 2 for x in title_lengths])
 
     def get_times(self, start, end, station) -> pd.DatetimeIndex:
         return pd.date_range(start, end, freq='1h')
@@ -26,14 +35,14 @@ class SrExtractor(PlaylistExtractor):
     def extract(self, station: str, document: bytes, date) -> pd.DataFrame:
         log_extra = {'station': station}
 
-        soup = BeautifulSoup(document, 'html.parser').find(class_='musicResearch')
+        soup = parse_html(document, self.html_parser).find(class_='musicResearch')
 
         if not soup:
             self.logger.warning(f'No playlist data found for {date}', extra=log_extra)
             return pd.DataFrame()
 
         if station != 'sr2':
-            time = [date.strftime('%Y%m%d') + ' ' + e.text for e in soup.find_all(class_='musicResearch__Item__Time')]
+            time = [e.text for e in soup.find_all(class_='musicResearch__Item__Time')]
             content = soup.find_all(class_='musicResearch__Item__Content')
             artist = [e.find(class_='musicResearch__Item__Content__Artist').text for e in content]
             title = [e.find(class_='musicResearch__Item__Content__Title').text for e in content]
@@ -41,13 +50,14 @@ class SrExtractor(PlaylistExtractor):
             df = pd.DataFrame({
                 'artist': artist,
                 'title': title
-            }, index=pd.Series(data=pd.to_datetime(time, format='%Y%m%d %H:%M'), name='time'),
+            }, index=pd.Series(data=on_date(date, time), name='time'),
                 dtype=str)
         else:
-            df = pd.DataFrame()
+            # collect the rows first, concatenating a DataFrame per row would copy the whole frame each time
+            times = []
+            rows = []
 
-            title_lengths = [len(content.find_all(class_='musicResearch__Item__Content__Title')) for content in soup.find_all(class_='musicResearch__Item__Content')]
-            if any([x > 2 for x in title_lengths]):
+            if self.is_malformed(soup):
                 # incorrect html
                 info = soup.find_all(class_=['musicResearch__Item__Time', 'musicResearch__Item__Content__Title',
                                              'musicResearch__Item__Content__Artist'])
@@ -59,10 +69,8 @@ class SrExtractor(PlaylistExtractor):
                 for tag in info:
                     if 'musicResearch__Item__Time' in tag.attrs['class']:
                         if time is not None:
-                            date = pd.to_datetime(date.strftime('%Y%m%d') + ' ' + time, format='%Y%m%d %H:%M')
-                            df = pd.concat(
-                                [df, pd.DataFrame({'composer': composer, 'title': title, 'artist': '; '.join(artists)},
-                                                  index=pd.Series(date, name='time'))])
+                            times.append(time)
+                            rows.append({'composer': composer, 'title': title, 'artist': '; '.join(artists)})
 
                         time = tag.text
                         composer = ''
@@ -103,8 +111,11 @@ class SrExtractor(PlaylistExtractor):
                             break
                         artists.append(artist.text.strip())
 
-                    date = pd.to_datetime(date.strftime('%Y%m%d') + ' ' + time.text, format='%Y%m%d %H:%M')
-                    df = pd.concat([df, pd.DataFrame({'composer': composer, 'title': title, 'artist': '; '.join(artists)},
-                                                     index=pd.Series(date, name='time'))])
+                    times.append(time.text)
+                    rows.append({'composer': composer, 'title': title, 'artist': '; '.join(artists)})
+
+            df = pd.DataFrame()
+            if rows:
+                df = pd.DataFrame(rows, index=pd.Series(data=on_date(date, times), name='time'))
 
         return df
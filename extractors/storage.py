@@ -0,0 +1,450 @@
+import csv
+import glob
+import io
+import os
+import re
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+
+import pandas as pd
+
+from extractors import broadcasters
+from extractors.songs import SONG_COLUMNS, SongDictionary, normalise
+
+# Timestamps are always written with their time, pandas would leave it out if all rows written at once are at midnight
+CSV_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+TIMESTAMP_PATTERN = re.compile(rb'\d{4}-\d{2}-\d{2}( \d{2}:\d{2}(:\d{2}(\.\d+)?)?)?')
+
+
+def merge_playlists(old: pd.DataFrame, new: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Concatenates two playlist DataFrames, removes rows which are equal in time and all columns and sorts by time.
+
+    Returns the merged DataFrame and the rows of new which were not present in old."""
+    df = pd.concat([old.astype(str).assign(_new=False), new.astype(str).assign(_new=True)]).rename_axis('time')
+    df['time'] = df.index
+    df = df[~df.drop(columns='_new').duplicated()]
+    df.drop(columns='time', inplace=True)
+
+    added = df[df.pop('_new')]
+    return df.sort_index(kind='stable'), added.sort_index(kind='stable')
+
+
+class PlaylistStorage(ABC):
+    """Stores the playlist database of each station, i.e. a DataFrame indexed by time. All columns are stored as text."""
+
+    def __init__(self, directory: str = 'data'):
+        self.directory: str = directory
+
+    @abstractmethod
+    def read(self, broadcaster: str, station: str, columns: list[str] | None = None,
+             start: pd.Timestamp | None = None, end: pd.Timestamp | None = None) -> pd.DataFrame:
+        """Reads the database of a station, optionally only the given columns and the rows between start and end"""
+        pass
+
+    @abstractmethod
+    def write(self, broadcaster: str, station: str, df: pd.DataFrame):
+        """Replaces the database of a station"""
+        pass
+
+    @abstractmethod
+    def exists(self, broadcaster: str, station: str) -> bool:
+        pass
+
+    @abstractmethod
+    def stations(self) -> list[tuple[str, str]]:
+        """Returns the broadcaster and station of every database in the directory"""
+        pass
+
+    def last_timestamp(self, broadcaster: str, station: str) -> pd.Timestamp | None:
+        """Returns the newest timestamp in the database of a station or None if the database is empty"""
+        if not self.exists(broadcaster, station):
+            return None
+
+        df = self.read(broadcaster, station, columns=[])
+        return df.index.max() if len(df.index) else None
+
+    def time_range(self, broadcaster: str, station: str) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+        """Returns the oldest and the newest timestamp in the database of a station or None if it is empty"""
+        if not self.exists(broadcaster, station):
+            return None
+
+        df = self.read(broadcaster, station, columns=[])
+        return (df.index.min(), df.index.max()) if len(df.index) else None
+
+    def query(self, stations: list[str | tuple[str, str]] | None = None, start: pd.Timestamp | None = None,
+              end: pd.Timestamp | None = None, artist: str | None = None, title: str | None = None) -> pd.DataFrame:
+        """Returns the rows of all databases played between start and end (inclusive), with the columns broadcaster
+        and station added and sorted by time.
+
+        stations can contain broadcaster names, station names and (broadcaster, station) tuples, None selects all
+        databases (see select). artist and title filter by substring, ignoring case, diacritics and the spelling of
+        featuring (see normalise). Databases whose time range doesn't overlap the query are skipped without reading
+        them."""
+        frames = []
+        for broadcaster, station in self.select(stations):
+            time_range = self.time_range(broadcaster, station)
+            if time_range is None or (start is not None and time_range[1] < start) or \
+                    (end is not None and time_range[0] > end):
+                continue
+
+            df = self.read(broadcaster, station, start=start, end=end)
+            for column, value in (('artist', artist), ('title', title)):
+                if value is not None:
+                    if column not in df.columns:
+                        df = df.iloc[:0]
+                        break
+                    key = normalise(pd.Series([value]), artist=column == 'artist')[0]
+                    df = df[normalise(df[column], artist=column == 'artist').str.contains(key, regex=False, na=False)]
+
+            if len(df.index):
+                df.insert(0, 'broadcaster', broadcaster)
+                df.insert(1, 'station', station)
+                frames.append(df)
+
+        if not frames:
+            return pd.DataFrame(columns=['broadcaster', 'station'], index=pd.DatetimeIndex([], name='time'))
+        return pd.concat(frames).sort_index(kind='stable')
+
+    def select(self, stations: list[str | tuple[str, str]] | None = None) -> list[tuple[str, str]]:
+        """Returns the databases selected by a list of broadcaster names, station names (of all broadcasters with a
+        station of that name) and (broadcaster, station) tuples, or all databases if stations is None.
+
+        Raises a ValueError for names which are neither a broadcaster nor the station of a database."""
+        databases = self.stations()
+        if stations is None:
+            return databases
+
+        known_broadcasters = set(broadcasters()) | {broadcaster for broadcaster, _ in databases}
+        selected = set()
+        for s in stations:
+            if not isinstance(s, str):
+                selected.add(tuple(s))
+            elif s in known_broadcasters:
+                selected.update(database for database in databases if database[0] == s)
+            else:
+                matches = [database for database in databases if database[1] == s]
+                if not matches:
+                    raise ValueError(f'Unknown broadcaster or station: {s}')
+                selected.update(matches)
+
+        return [database for database in databases if database in selected]
+
+    def update(self, broadcaster: str, station: str, new_data: pd.DataFrame) -> pd.DataFrame:
+        """Adds new rows to the database of a station and returns the rows which were not present yet"""
+        if new_data.empty:
+            return new_data
+
+        df = self.read(broadcaster, station) if self.exists(broadcaster, station) else pd.DataFrame()
+        merged, added = merge_playlists(df, new_data)
+        self.write(broadcaster, station, merged)
+        return added
+
+
+class CsvStorage(PlaylistStorage):
+    """One csv file per station at {directory}/{broadcaster}_{station}.csv"""
+
+    def path(self, broadcaster: str, station: str) -> str:
+        return os.path.join(self.directory, f'{broadcaster}_{station}.csv')
+
+    def exists(self, broadcaster: str, station: str) -> bool:
+        return os.path.isfile(self.path(broadcaster, station))
+
+    def stations(self) -> list[tuple[str, str]]:
+        paths = glob.glob(os.path.join(self.directory, '*_*.csv'))
+        return sorted(tuple(os.path.basename(p)[:-len('.csv')].split('_', 1)) for p in paths)
+
+    def read(self, broadcaster: str, station: str, columns: list[str] | None = None,
+             start: pd.Timestamp | None = None, end: pd.Timestamp | None = None) -> pd.DataFrame:
+        path = self.path(broadcaster, station)
+        usecols = None if columns is None else ['time'] + list(columns)
+        if start is None and end is None:
+            return pd.read_csv(path, parse_dates=[0], index_col='time', usecols=usecols, dtype=str)
+
+        # the file is sorted by time, so only the lines between start and end have to be read
+        with open(path, 'rb') as f:
+            header = f.readline()
+            begin = self._offset(f, start) if start is not None else len(header)
+            stop = self._offset(f, end, after=True) if end is not None else os.path.getsize(path)
+            f.seek(begin)
+            lines = f.read(max(0, stop - begin))
+
+        df = pd.read_csv(io.BytesIO(header + lines), parse_dates=[0], index_col='time', usecols=usecols, dtype=str)
+        return df.loc[start:end]
+
+    def write(self, broadcaster: str, station: str, df: pd.DataFrame):
+        os.makedirs(self.directory, exist_ok=True)
+        df.to_csv(self.path(broadcaster, station), date_format=CSV_TIME_FORMAT)
+
+    def last_timestamp(self, broadcaster: str, station: str) -> pd.Timestamp | None:
+        path = self.path(broadcaster, station)
+        if not os.path.isfile(path):
+            return None
+
+        # the file is sorted by time, so only the last line has to be read
+        for _, timestamp in self._lines_from_end(path):
+            return timestamp
+
+        return None
+
+    def time_range(self, broadcaster: str, station: str) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+        last = self.last_timestamp(broadcaster, station)
+        if last is None:
+            return None
+
+        with open(self.path(broadcaster, station), 'rb') as f:
+            f.readline()
+            for _, _, first in self._lines_from(f):
+                return first, last
+
+    def update(self, broadcaster: str, station: str, new_data: pd.DataFrame) -> pd.DataFrame:
+        """Merges new rows into the database while reading and rewriting only the rows since the oldest new row.
+
+        Duplicates can only occur in this overlap window, so memory and time depend on the amount of new data instead
+        of the length of the history. If the new data contains columns the file doesn't have, the whole file has to be
+        rewritten."""
+        path = self.path(broadcaster, station)
+        if new_data.empty:
+            return new_data
+        if not os.path.isfile(path):
+            return super().update(broadcaster, station, new_data)
+
+        with open(path, 'rb') as f:
+            header = f.readline()
+        columns = next(csv.reader([header.decode()]))[1:]
+        if not set(new_data.columns) <= set(columns):
+            return super().update(broadcaster, station, new_data)
+
+        since = new_data.index.min()
+        offset = os.path.getsize(path)
+        for line_offset, timestamp in self._lines_from_end(path):
+            if timestamp < since:
+                break
+            offset = line_offset
+
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            tail = f.read()
+        old = pd.read_csv(io.BytesIO(header + tail), parse_dates=[0], index_col='time', dtype=str)
+
+        merged, added = merge_playlists(old, new_data)
+        if added.empty:
+            return added
+
+        with open(path, 'r+b') as f:
+            f.truncate(offset)
+        merged.reindex(columns=columns).to_csv(path, mode='a', header=False, date_format=CSV_TIME_FORMAT)
+        return added
+
+    @staticmethod
+    def _lines_from(f) -> Iterator[tuple[int, int, pd.Timestamp]]:
+        """Yields the byte offset, the offset of the next line and the timestamp of each data line of a csv file opened
+        in binary mode, starting at the current position of the file"""
+        offset = f.tell()
+        for line in f:
+            next_offset = offset + len(line)
+            field = line.split(b',', 1)[0]
+            if TIMESTAMP_PATTERN.fullmatch(field):
+                yield offset, next_offset, pd.Timestamp(field.decode())
+            offset = next_offset
+
+    @classmethod
+    def _offset(cls, f, time: pd.Timestamp, after: bool = False, block_size: int = 65536) -> int:
+        """Returns the byte offset of the first data line whose timestamp is at least time (or greater than time if after
+        is set) or the size of the file if there is none. Uses a binary search over the file, which is sorted by time."""
+        def before(timestamp: pd.Timestamp) -> bool:
+            return timestamp <= time if after else timestamp < time
+
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(0)
+        f.readline()
+        # all lines before low are before time
+        low, high = f.tell(), size
+        while high - low > block_size:
+            middle = (low + high) // 2
+            f.seek(middle)
+            f.readline()  # skip the rest of the line containing the middle
+            line = next(cls._lines_from(f), None)
+            if line is None or line[0] >= high:
+                high = middle
+            elif before(line[2]):
+                low = line[1]
+            else:
+                high = line[0]
+
+        f.seek(low)
+        for offset, _, timestamp in cls._lines_from(f):
+            if not before(timestamp):
+                return offset
+        return size
+
+    @staticmethod
+    def _lines_from_end(path: str, block_size: int = 65536) -> Iterator[tuple[int, pd.Timestamp]]:
+        """Yields the byte offset and timestamp of each data line of a csv file, starting with the last line.
+
+        Lines whose first field is not a timestamp (the header, empty lines or continuations of quoted values containing
+        line breaks) are skipped."""
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            rest = b''
+            while position > 0:
+                step = min(block_size, position)
+                position -= step
+                f.seek(position)
+                block = f.read(step) + rest
+
+                lines = block.split(b'\n')
+                # the first line might be incomplete, unless the beginning of the file has been reached
+                rest = lines.pop(0) if position > 0 else b''
+                line_offset = position + len(block)
+                for line in reversed(lines):
+                    line_offset -= len(line) + 1
+                    field = line.split(b',', 1)[0]
+                    if TIMESTAMP_PATTERN.fullmatch(field):
+                        yield line_offset + 1, pd.Timestamp(field.decode())
+
+
+class ParquetStorage(PlaylistStorage):
+    """One directory per station at {directory}/{broadcaster}_{station}, containing one parquet file per month.
+
+    Updates only rewrite the months that received new rows and reads only open the months and columns they need.
+
+    If encode_songs is set, artists and titles are stored as IDs of the SongDictionary in {directory}/songs.sqlite
+    (columns artist_id and title_id). Reads always return artist and title, as categoricals if they were encoded."""
+
+    def __init__(self, directory: str = 'data', encode_songs: bool = False):
+        super().__init__(directory)
+        self.encode_songs: bool = encode_songs
+        self._songs: SongDictionary | None = None
+
+    @property
+    def songs(self) -> SongDictionary:
+        """The dictionary of artists and titles, shared by all stations in the directory"""
+        if self._songs is None:
+            self._songs = SongDictionary(os.path.join(self.directory, 'songs.sqlite'))
+        return self._songs
+
+    def path(self, broadcaster: str, station: str) -> str:
+        return os.path.join(self.directory, f'{broadcaster}_{station}')
+
+    def partition_path(self, broadcaster: str, station: str, month: pd.Period) -> str:
+        return os.path.join(self.path(broadcaster, station), f'{month.strftime("%Y-%m")}.parquet')
+
+    def partitions(self, broadcaster: str, station: str) -> dict[pd.Period, str]:
+        """Returns the paths of all partitions of a station, sorted by month"""
+        paths = glob.glob(os.path.join(self.path(broadcaster, station), '*.parquet'))
+        return dict(sorted((pd.Period(os.path.basename(p).split('.')[0], freq='M'), p) for p in paths))
+
+    def exists(self, broadcaster: str, station: str) -> bool:
+        return bool(self.partitions(broadcaster, station))
+
+    def stations(self) -> list[tuple[str, str]]:
+        paths = glob.glob(os.path.join(self.directory, '*_*', '*.parquet'))
+        return sorted({tuple(os.path.basename(os.path.dirname(p)).split('_', 1)) for p in paths})
+
+    def read(self, broadcaster: str, station: str, columns: list[str] | None = None,
+             start: pd.Timestamp | None = None, end: pd.Timestamp | None = None) -> pd.DataFrame:
+        first = start.to_period('M') if start is not None else None
+        last = end.to_period('M') if end is not None else None
+
+        # the row group statistics of the time column let pyarrow skip the row groups outside of start and end
+        filters = ([('time', '>=', start)] if start is not None else []) + \
+                  ([('time', '<=', end)] if end is not None else [])
+        frames = [self._read_partition(path, columns=columns, filters=filters or None)
+                  for month, path in self.partitions(broadcaster, station).items()
+                  if (first is None or month >= first) and (last is None or month <= last)]
+        if not frames:
+            return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name='time'))
+
+        df = pd.concat(frames)
+        # concatenating categoricals with different categories results in strings
+        for column in SONG_COLUMNS:
+            if any(isinstance(f.get(column, pd.Series()).dtype, pd.CategoricalDtype) for f in frames):
+                df[column] = df[column].astype('category')
+        return df.loc[start:end]
+
+    def write(self, broadcaster: str, station: str, df: pd.DataFrame):
+        os.makedirs(self.path(broadcaster, station), exist_ok=True)
+        for path in self.partitions(broadcaster, station).values():
+            os.remove(path)
+
+        self._write_partitions(broadcaster, station, df)
+
+    def last_timestamp(self, broadcaster: str, station: str) -> pd.Timestamp | None:
+        partitions = self.partitions(broadcaster, station)
+        if not partitions:
+            return None
+
+        df = pd.read_parquet(list(partitions.values())[-1], columns=[])
+        return df.index.max() if len(df.index) else None
+
+    def time_range(self, broadcaster: str, station: str) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+        partitions = list(self.partitions(broadcaster, station).values())
+        if not partitions:
+            return None
+
+        # read from the statistics in the file footers instead of the data
+        first = self._time_statistics(partitions[0])
+        last = self._time_statistics(partitions[-1])
+        if first is None or last is None:
+            return super().time_range(broadcaster, station)
+        return first[0], last[1]
+
+    @staticmethod
+    def _time_statistics(path: str) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+        """Returns the minimum and maximum of the time column of a parquet file from its row group statistics"""
+        import pyarrow.parquet as pq
+
+        metadata = pq.ParquetFile(path).metadata
+        if 'time' not in metadata.schema.names or metadata.num_rows == 0:
+            return None
+
+        column = metadata.schema.names.index('time')
+        statistics = [metadata.row_group(i).column(column).statistics for i in range(metadata.num_row_groups)]
+        if not all(s is not None and s.has_min_max for s in statistics):
+            return None
+        return pd.Timestamp(min(s.min for s in statistics)), pd.Timestamp(max(s.max for s in statistics))
+
+    def update(self, broadcaster: str, station: str, new_data: pd.DataFrame) -> pd.DataFrame:
+        if new_data.empty:
+            return new_data
+
+        os.makedirs(self.path(broadcaster, station), exist_ok=True)
+        partitions = self.partitions(broadcaster, station)
+        added = []
+        for month, rows in new_data.groupby(new_data.index.to_period('M')):
+            old = self._read_partition(partitions[month]) if month in partitions else pd.DataFrame()
+            merged, added_rows = merge_playlists(old, rows)
+            if not added_rows.empty:
+                self._write_partitions(broadcaster, station, merged)
+                added.append(added_rows)
+
+        return pd.concat(added) if added else new_data.iloc[:0]
+
+    def _read_partition(self, path: str, columns: list[str] | None = None, filters: list | None = None) -> pd.DataFrame:
+        """Reads a partition and decodes the IDs of artists and titles"""
+        if columns is not None:
+            import pyarrow.parquet as pq
+
+            # partitions written before encode_songs was set contain the names instead of IDs
+            names = pq.read_schema(path).names
+            columns = [f'{c}_id' if c in SONG_COLUMNS and f'{c}_id' in names else c for c in columns]
+
+        df = pd.read_parquet(path, columns=columns, filters=filters)
+        if any(f'{column}_id' in df.columns for column in SONG_COLUMNS):
+            df = self.songs.decode_playlist(df)
+        return df
+
+    def _write_partitions(self, broadcaster: str, station: str, df: pd.DataFrame):
+        df = df.rename_axis('time')
+        if self.encode_songs:
+            df = self.songs.encode_playlist(df)
+        for month, rows in df.groupby(df.index.to_period('M')):
+            path = self.partition_path(broadcaster, station, month)
+            rows.to_parquet(path + '.tmp')
+            os.replace(path + '.tmp', path)  # never leave a half-written partition behind
+
+
+STORAGE_BACKENDS: dict[str, type[PlaylistStorage]] = {'csv': CsvStorage,
+                                                       'parquet': ParquetStorage}
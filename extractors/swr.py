@@ -1,6 +1,6 @@
 import pandas as pd
-from bs4 import BeautifulSoup
 
+from extractors.html_parser import parse_html
 from extractors.playlist_extractor import PlaylistExtractor
 
 
@@ -11,9 +11,10 @@ class SwrExtractor(PlaylistExtractor):
                 'swr3': 'https://www.swr3.de/playlisten/index.html',
                 'swr4': 'https://www.swr.de/swr4/musik/musikrecherche-s-bw-102.html',
                 'dasding': 'https://www.dasding.de/03-playlistsuche/index.html'}
+    html_parser = 'lxml'  # extracts the same DataFrames as BeautifulSoup, see tests/test_html_parser.py
 
-    def __init__(self, log=True, sleep_secs=1):
-        super().__init__(log, sleep_secs)
+    def __init__(self, log=True, sleep_secs=1, **kwargs):
+        super().__init__(log, sleep_secs, **kwargs)
 
     def get_times(self, start, end, station) -> pd.DatetimeIndex:
         return pd.date_range(start, end, freq='1h')
@@ -27,7 +28,7 @@ class SwrExtractor(PlaylistExtractor):
     def extract(self, station: str, document: bytes, date) -> pd.DataFrame:
         log_extra = {'station': station}
 
-        soup = BeautifulSoup(document, 'html.parser').find(class_='list-playlist')
+        soup = parse_html(document, self.html_parser).find(class_='list-playlist')
 
         if not soup:
             self.logger.warning(f'No playlist data found for {date}', extra=log_extra)
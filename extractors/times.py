@@ -0,0 +1,43 @@
+from collections.abc import Iterable
+
+import pandas as pd
+
+# Times of day parsed without a date fall on this date
+EPOCH = pd.Timestamp(1900, 1, 1)
+
+ONE_DAY = pd.Timedelta(days=1)
+
+
+def time_of_day(values: Iterable[str], format: str = '%H:%M',
+                default: pd.Timestamp | None = None) -> pd.TimedeltaIndex:
+    """Parses times of day (e.g. 14:05) into the time since midnight. Missing or empty values are NaT, or the time of
+    day of default if it is given."""
+    times = pd.to_datetime(pd.Index(values, dtype=object), format=format) - EPOCH
+    return times if default is None else times.fillna(default - default.normalize())
+
+
+def on_date(date: pd.Timestamp, values: Iterable[str], format: str = '%H:%M',
+            default: pd.Timestamp | None = None) -> pd.DatetimeIndex:
+    """Returns the timestamps of times of day on the day of date, e.g. the times of a playlist of that day"""
+    return date.normalize() + time_of_day(values, format, default)
+
+
+def roll_back(times: pd.DatetimeIndex, end: pd.Timestamp) -> pd.DatetimeIndex:
+    """Moves the timestamps whose time of day is later than the time of day of end to the previous day, for playlists
+    up to end which start before midnight"""
+    times = pd.DatetimeIndex(times)
+    return times.where(times - times.normalize() <= end - end.normalize(), times - ONE_DAY)
+
+
+def wall_time(values: Iterable[str]) -> pd.DatetimeIndex:
+    """Parses ISO 8601 timestamps with UTC offsets (e.g. 2024-01-01T14:05:00+01:00) into naive timestamps of their
+    local time, also if the offsets differ (e.g. at a change of daylight saving time)"""
+    local = pd.Index(values, dtype=object).str.replace(r'(\d\d:\d\d(?::\d\d(?:\.\d+)?)?)(?:Z|[+-]\d\d(?::?\d\d)?)$',
+                                                       r'\1', regex=True)
+    return pd.to_datetime(local, format='ISO8601')
+
+
+def duration_seconds(values: Iterable[str]) -> pd.Index:
+    """Parses durations (e.g. 00:03:25) into seconds, without whole days like Timedelta.seconds"""
+    durations = pd.to_timedelta(pd.Index(values, dtype=object))
+    return (durations - durations.floor('D')) // pd.Timedelta(seconds=1)
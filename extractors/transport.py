@@ -0,0 +1,122 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from collections.abc import Mapping
+from datetime import timedelta
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/112.0.0.0 ' \
+             'Safari/537.36 OPR/98.0.0.0'
+
+
+class TransportResponse(NamedTuple):
+    status_code: int
+    reason: str
+    headers: Mapping[str, str]  # case-insensitive
+    content: bytes  # decompressed
+    elapsed: timedelta
+
+
+class Transport(ABC):
+    """Sends the HTTP requests of an extractor over a pool of persistent connections. One transport can be shared by
+    all stations of a broadcaster (and by several extractors), it is safe to use from several threads.
+
+    The latency of every request, including the time to open a connection, is recorded per host (the first one and
+    the latest max_samples)."""
+
+    # Exceptions raised for failed requests (connection errors, timeouts etc.), which are retried by the extractors
+    errors: tuple[type[Exception], ...] = ()
+
+    max_samples: int = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests: dict[str, int] = defaultdict(int)
+        self.first_latencies: dict[str, float] = {}
+        self.latencies: dict[str, deque[float]] = defaultdict(lambda: deque(maxlen=self.max_samples))
+
+    @abstractmethod
+    def send(self, method: str, url: str, data=None, headers: dict[str, str] | None = None) -> TransportResponse:
+        pass
+
+    def request(self, url: str, data=None, headers: dict[str, str] | None = None) -> TransportResponse:
+        """Sends a GET request (or a POST request if form data is given)"""
+        start = time.perf_counter()
+        response = self.send('POST' if data else 'GET', url, data, headers)
+        latency = time.perf_counter() - start
+        host = urlsplit(url).netloc
+        with self.lock:
+            self.requests[host] += 1
+            self.first_latencies.setdefault(host, latency)
+            self.latencies[host].append(latency)
+        return response
+
+    def latency_report(self) -> pd.DataFrame:
+        """Returns the number of requests and their latency in seconds per host. The first request to a host has to
+        open a connection, so the difference between first and median is roughly the cost of a new connection."""
+        with self.lock:
+            latencies = {host: pd.Series(list(values)) for host, values in self.latencies.items()}
+
+        report = pd.DataFrame([{'host': host, 'requests': self.requests[host], 'first': self.first_latencies[host],
+                                'median': values.median(), 'p95': values.quantile(0.95), 'max': values.max()}
+                               for host, values in latencies.items()],
+                              columns=['host', 'requests', 'first', 'median', 'p95', 'max'])
+        return report.set_index('host').sort_index()
+
+    def close(self):
+        pass
+
+
+class RequestsTransport(Transport):
+    """HTTP/1.1 with keep-alive using requests. pool_connections is the number of hosts whose connections are kept
+    and pool_maxsize the number of connections kept per host, which should be at least
+    PlaylistExtractor.max_requests_per_host. Compressed responses (gzip, deflate and, if the brotli or zstandard
+    packages are installed, br and zstd) are accepted and decompressed."""
+
+    errors = (requests.exceptions.RequestException,)
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, timeout: float | None = 60,
+                 headers: dict[str, str] | None = None):
+        super().__init__()
+        self.timeout: float | None = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'User-Agent': USER_AGENT} | (headers or {}))
+
+    def send(self, method: str, url: str, data=None, headers: dict[str, str] | None = None) -> TransportResponse:
+        r = self.session.request(method, url, data=data, headers=headers, timeout=self.timeout)
+        return TransportResponse(r.status_code, r.reason, r.headers, r.content, r.elapsed)
+
+    def close(self):
+        self.session.close()
+
+
+class HttpxTransport(Transport):
+    """Uses httpx (an optional dependency, HTTP/2 needs `pip install httpx[http2]`). With http2, all requests to a host
+    are multiplexed over a single connection if the server supports it, otherwise HTTP/1.1 with keep-alive is used."""
+
+    def __init__(self, http2: bool = True, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30, timeout: float | None = 60, headers: dict[str, str] | None = None):
+        import httpx
+
+        super().__init__()
+        self.errors = (httpx.HTTPError,)
+        self.client = httpx.Client(http2=http2, timeout=timeout, headers={'User-Agent': USER_AGENT} | (headers or {}),
+                                   limits=httpx.Limits(max_connections=max_connections,
+                                                       max_keepalive_connections=max_keepalive_connections,
+                                                       keepalive_expiry=keepalive_expiry))
+
+    def send(self, method: str, url: str, data=None, headers: dict[str, str] | None = None) -> TransportResponse:
+        r = self.client.request(method, url, data=data, headers=headers)
+        return TransportResponse(r.status_code, r.reason_phrase, r.headers, r.content, r.elapsed)
+
+    def close(self):
+        self.client.close()
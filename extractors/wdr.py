@@ -1,7 +1,7 @@
 import pandas as pd
-from bs4 import BeautifulSoup
 import re
 
+from extractors.html_parser import parse_html
 from extractors.playlist_extractor import PlaylistExtractor
 
 
@@ -15,9 +15,10 @@ class WdrExtractor(PlaylistExtractor):
                 'wdr4': 'wdr4/titelsuche-wdrvier-102.jsp',
                 'wdr5': 'wdr5/musik/titelsuche-wdrfuenf-104.jsp',
                 'cosmo': 'cosmo/musik/playlist/index.jsp'}
+    html_parser = 'lxml'  # extracts the same DataFrames as BeautifulSoup, see tests/test_html_parser.py
 
-    def __init__(self, log=True, sleep_secs=1):
-        super().__init__(log, sleep_secs)
+    def __init__(self, log=True, sleep_secs=1, **kwargs):
+        super().__init__(log, sleep_secs, **kwargs)
 
     def get_times(self, start, end, station) -> pd.DatetimeIndex:
         return pd.date_range(start, end, freq='1h')
@@ -35,7 +36,7 @@ class WdrExtractor(PlaylistExtractor):
     def extract(self, station: str, document: bytes, date) -> pd.DataFrame:
         log_extra = {'station': station}
 
-        soup = BeautifulSoup(document, 'html.parser').find(id='searchPlaylistResult')
+        soup = parse_html(document, self.html_parser).find(id='searchPlaylistResult')
 
         df = pd.DataFrame()
         if not soup:
@@ -52,7 +53,9 @@ class WdrExtractor(PlaylistExtractor):
         if station == 'wdr3':
             df['composer'] = [e.text.strip() for e in soup.find_all(class_='composer')]
 
-            for i, el in enumerate(soup.find_all(class_='performer')):
+            # the roles of all performers are collected first and added with a single combine_first
+            roles = []
+            for el in soup.find_all(class_='performer'):
                 delimiters = [e.text for e in el.find_all('strong')]
 
                 if delimiters:
@@ -66,7 +69,11 @@ class WdrExtractor(PlaylistExtractor):
                             f'{date}: Length of columns ({len(cols)}) and values ({len(values)}) is not equal',
                             extra=log_extra)
 
-                    df = df.combine_first(
-                        pd.DataFrame(dict(zip(cols, values)), index=pd.Series(df.index[i], name='time')))
+                    roles.append(dict(zip(cols, values)))
+                else:
+                    roles.append({})
+
+            if any(roles):
+                df = df.combine_first(pd.DataFrame(roles, index=df.index)).sort_index(kind='stable')
 
         return df
@@ -0,0 +1,18 @@
+import argparse
+
+from extractors.storage import CsvStorage, ParquetStorage
+
+parser = argparse.ArgumentParser(description='Converts the csv databases to partitioned parquet databases')
+parser.add_argument('--directory', default='data', help='directory containing the csv databases (default: data)')
+parser.add_argument('--encode-songs', action='store_true',
+                    help='store artists and titles as IDs of a global dictionary in songs.sqlite')
+args = parser.parse_args()
+
+csv_storage = CsvStorage(args.directory)
+parquet_storage = ParquetStorage(args.directory, encode_songs=args.encode_songs)
+
+# only the station databases, other csv files in the directory (e.g. now-playing.csv of the poller) are skipped
+for broadcaster, station in csv_storage.stations():
+    df = csv_storage.read(broadcaster, station)
+    parquet_storage.write(broadcaster, station, df)
+    print(f'{broadcaster}: {station}: converted {len(df)} rows to {parquet_storage.path(broadcaster, station)}')
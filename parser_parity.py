@@ -0,0 +1,44 @@
+import argparse
+import sys
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from extractors import extractor_classes
+from extractors.playlist_extractor import setup_logging
+from extractors.raw_cache import PackedRawCache
+
+
+parser = argparse.ArgumentParser(description='Checks that the lxml and the BeautifulSoup backend of parse_html extract '
+                                             'identical DataFrames from the documents in the raw cache')
+parser.add_argument('--broadcaster', action='append', help='only check this broadcaster (can be repeated)')
+parser.add_argument('--limit', type=int, default=50, help='number of newest documents per station (default: 50)')
+args = parser.parse_args()
+setup_logging()
+
+# PackedRawCache also reads documents saved as single files
+raw_cache = PackedRawCache()
+checked = 0
+mismatches = 0
+for cls in extractor_classes(args.broadcaster):
+    if cls.file_extension != 'html' or (args.broadcaster and cls.broadcaster not in args.broadcaster):
+        continue
+
+    fast = cls(raw_cache=raw_cache)
+    fast.html_parser = 'lxml'
+    fallback = cls(raw_cache=raw_cache)
+    fallback.html_parser = 'bs4'
+
+    for station in cls.stations:
+        entries = raw_cache.entries(cls.broadcaster, station, pd.Timestamp.min, pd.Timestamp.max)
+        for t in sorted(entries)[-args.limit:]:
+            document = raw_cache.get(cls.broadcaster, station, t)
+            checked += 1
+            try:
+                assert_frame_equal(fallback.extract(station, document, t), fast.extract(station, document, t))
+            except Exception as e:
+                mismatches += 1
+                print(f'{cls.broadcaster}: {station}: {t}: {type(e).__name__}: {e}')
+
+print(f'{checked} documents checked, {mismatches} mismatches')
+sys.exit(1 if mismatches else 0)
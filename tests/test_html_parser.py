@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from extractors.br import BrExtractor
+from extractors.hr import HrExtractor
+from extractors.html_parser import parse_html
+from extractors.ndr import NdrExtractor
+from extractors.rbb import RbbExtractor
+from extractors.sr import SrExtractor
+from extractors.swr import SwrExtractor
+from extractors.wdr import WdrExtractor
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+DATE = pd.Timestamp(2026, 1, 1, 12)
+
+# (extractor class, station, fixture document)
+DOCUMENTS = [(BrExtractor, 'br1', 'br_br1.html'),
+             (HrExtractor, 'hr1', 'hr_hr1.html'),
+             (HrExtractor, 'hr2-kultur', 'hr_hr2-kultur.html'),
+             (HrExtractor, 'hr2-kultur', 'hr_hr2-kultur_unclosed_li.html'),
+             (NdrExtractor, 'ndr2', 'ndr_ndr2.html'),
+             (NdrExtractor, 'kultur', 'ndr_kultur.html'),
+             (RbbExtractor, '888', 'rbb_888.html'),
+             (RbbExtractor, 'fritz', 'rbb_fritz.html'),
+             (RbbExtractor, 'radioeins', 'rbb_radioeins.html'),
+             (RbbExtractor, 'radiodrei', 'rbb_radiodrei.html'),
+             (SrExtractor, 'sr1', 'sr_sr1.html'),
+             (SrExtractor, 'sr2', 'sr_sr2.html'),
+             (SrExtractor, 'sr2', 'sr_sr2_malformed.html'),
+             (SwrExtractor, 'swr3', 'swr_swr3.html'),
+             (WdrExtractor, 'wdr2', 'wdr_wdr2.html'),
+             (WdrExtractor, 'wdr3', 'wdr_wdr3.html')]
+
+
+def read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('cls, station, fixture', DOCUMENTS, ids=[fixture for _, _, fixture in DOCUMENTS])
+def test_backends_extract_identical_data(cls, station, fixture):
+    document = read_fixture(fixture)
+    extracted = {}
+    for backend in ('bs4', 'lxml'):
+        extractor = cls()
+        extractor.html_parser = backend
+        extracted[backend] = extractor.extract(station, document, DATE)
+
+    assert not extracted['bs4'].empty
+    assert_frame_equal(extracted['bs4'], extracted['lxml'])
+
+
+@pytest.mark.parametrize('backend', ['bs4', 'lxml'])
+def test_unclosed_li_keeps_composers_of_their_entries(backend):
+    extractor = HrExtractor()
+    extractor.html_parser = backend
+    df = extractor.extract('hr2-kultur', read_fixture('hr_hr2-kultur_unclosed_li.html'), DATE)
+
+    assert list(df['composer']) == ['', 'C1', 'C2', '', 'C4']
+
+
+@pytest.mark.parametrize('backend', ['bs4', 'lxml'])
+def test_malformed_sr2_page_is_detected(backend):
+    soup = parse_html(read_fixture('sr_sr2_malformed.html'), backend).find(class_='musicResearch')
+    assert SrExtractor.is_malformed(soup)
+
+    soup = parse_html(read_fixture('sr_sr2.html'), backend).find(class_='musicResearch')
+    assert not SrExtractor.is_malformed(soup)
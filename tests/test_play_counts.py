@@ -0,0 +1,22 @@
+import pandas as pd
+
+from extractors.play_counts import PlayCounts
+
+
+def test_trend_filters_normalised_keys(tmp_path):
+    play_counts = PlayCounts(str(tmp_path))
+    times = pd.date_range('2024-01-01 10:00', periods=4, freq='1D', name='time')
+    play_counts.add('test', 'a', pd.DataFrame({'artist': ['Beyoncé', 'BEYONCE', 'Die Ärzte', 'Beyoncé'],
+                                               'title': ['Halo', 'Halo', 'Schrei nach Liebe', 'Crazy in Love']},
+                                              index=times))
+    play_counts.add('test', 'b', pd.DataFrame({'artist': ['Beyonce'], 'title': ['halo']}, index=times[:1]))
+
+    df = play_counts.trend(artist='beyonce', title='HALO', period='month')
+    assert list(df['plays']) == [3]
+    assert list(df['artist']) == ['Beyoncé']
+
+    df = play_counts.trend(artist='beyonce', period='day', stations=[('test', 'a')], by_station=True)
+    assert list(df['plays']) == [1, 1, 1]
+    assert list(df['title']) == ['Halo', 'Halo', 'Crazy in Love']
+
+    assert play_counts.trend(artist='ärzte', title='love').empty
@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+
+from extractors.playlist_extractor import PlaylistExtractor
+from extractors.raw_cache import RawCache
+from extractors.scheduler import Scheduler
+from extractors.storage import CsvStorage
+
+
+class HourlyExtractor(PlaylistExtractor):
+    broadcaster = 'test'
+    stations = ['station']
+    oldest_timestamp = pd.Timedelta(days=7)
+
+    def get_times(self, start, end, station) -> pd.DatetimeIndex:
+        return pd.date_range(start, end, freq='1h')
+
+    def get_url(self, station: str, time):
+        return f'http://localhost/{station}/{time:%Y%m%d%H}', {}
+
+    def extract(self, station: str, document: bytes, time) -> pd.DataFrame:
+        return pd.DataFrame()
+
+
+@pytest.fixture
+def extractor(tmp_path) -> HourlyExtractor:
+    extractor = HourlyExtractor(storage=CsvStorage(str(tmp_path / 'data')), raw_cache=RawCache(str(tmp_path / 'raw')))
+    yield extractor
+    extractor.close()
+
+
+def test_report_skips_stored_and_cached_hours(extractor):
+    day = (pd.Timestamp.now() - pd.Timedelta(days=2)).normalize()
+    times = pd.DatetimeIndex([day + pd.Timedelta(minutes=10), day + pd.Timedelta(hours=5, minutes=30)], name='time')
+    songs = pd.DataFrame({'artist': ['a', 'b'], 'title': ['c', 'd']}, index=times)
+    extractor.storage.update(extractor.broadcaster, 'station', songs)
+
+    # like download_documents, look up the manifest (which indexes the files of the raw folder) before saving documents
+    extractor.raw_cache.entries(extractor.broadcaster, 'station', day, day)
+    # downloaded more than a day later, so they don't have to be downloaded again, except for the failed request
+    for hour, status in [(6, 200), (7, 200), (8, 500)]:
+        extractor.raw_cache.put(extractor.broadcaster, 'station', day + pd.Timedelta(hours=hour), 'html', b'<html>',
+                                status)
+
+    report = Scheduler([extractor]).report()
+    hours = set(report['hour'])
+
+    # the update starts at the beginning of the day of the newest stored song
+    assert extractor.update_range('station')[0] == day
+    assert not {day + pd.Timedelta(hours=h) for h in [0, 4, 6, 7]} & hours
+    assert {day + pd.Timedelta(hours=h) for h in [5, 8, 9]} <= hours
+    assert len(report) == len(hours)
+
+
+class StreamingExtractor(HourlyExtractor):
+    oldest_timestamp = pd.Timedelta(days=4)
+    failing_window: pd.Timestamp | None = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # (start of the window, time of the batch, newest stored row when the next batch is extracted)
+        self.batches: list[tuple[pd.Timestamp, pd.Timestamp, pd.Timestamp | None]] = []
+
+    def stream(self, station: str, start, end, progress_bar, skip_unchanged: bool = False):
+        for t in pd.date_range(start, min(end, pd.Timestamp.now()), freq='6h'):
+            if start == self.failing_window and t > start:
+                raise RuntimeError('download failed')
+            yield pd.DataFrame({'artist': [f'artist {t}'], 'title': ['title']},
+                               index=pd.DatetimeIndex([t], name='time'))
+            self.batches.append((start, t, self.storage.last_timestamp(self.broadcaster, station)))
+
+
+@pytest.fixture
+def streaming_extractor(tmp_path) -> StreamingExtractor:
+    extractor = StreamingExtractor(storage=CsvStorage(str(tmp_path / 'data')),
+                                   raw_cache=RawCache(str(tmp_path / 'raw')))
+    yield extractor
+    extractor.close()
+
+
+def test_run_stores_batches_of_the_oldest_window_while_downloading(streaming_extractor):
+    scheduler = Scheduler([streaming_extractor], workers=4, windows_per_station=2)
+    windows = scheduler.plan()[(streaming_extractor.broadcaster, 'station')]
+    scheduler.run()
+
+    first = windows[0].start
+    assert all(stored == t for start, t, stored in streaming_extractor.batches if start == first)
+    stored = streaming_extractor.storage.read(streaming_extractor.broadcaster, 'station')
+    assert list(stored.index) == sorted(t for _, t, _ in streaming_extractor.batches)
+    progress = streaming_extractor.journal.progress()
+    assert progress['completed_at'].notna().sum() == len(windows)
+
+
+def test_run_keeps_stored_batches_of_a_failed_window(streaming_extractor):
+    scheduler = Scheduler([streaming_extractor], workers=4, windows_per_station=2)
+    windows = scheduler.plan()[(streaming_extractor.broadcaster, 'station')]
+    streaming_extractor.failing_window = windows[1].start
+    scheduler.run()
+
+    stored = streaming_extractor.storage.read(streaming_extractor.broadcaster, 'station')
+    # the first window and the batch of the failed window extracted before the error, but nothing later
+    assert stored.index.max() == windows[1].start
+    progress = streaming_extractor.journal.progress()
+    assert progress['completed_at'].notna().sum() == 1
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from extractors.storage import STORAGE_BACKENDS, ParquetStorage
+
+
+@pytest.fixture(params=sorted(STORAGE_BACKENDS))
+def storage(request, tmp_path):
+    return STORAGE_BACKENDS[request.param](str(tmp_path))
+
+
+def test_update_leaves_new_data_unchanged(storage):
+    new_data = pd.DataFrame({'artist': ['a', 'b'], 'title': ['c', 'd']},
+                            index=pd.DatetimeIndex(['2024-01-01 10:00', '2024-02-01 10:00'], name='Zeit'))
+    expected = new_data.copy()
+
+    added = storage.update('test', 'station', new_data)
+
+    pd.testing.assert_frame_equal(new_data, expected)
+    assert added.index.name == 'time'
+    assert storage.read('test', 'station').index.name == 'time'
+
+
+def test_parquet_write_leaves_data_unchanged(tmp_path):
+    storage = ParquetStorage(str(tmp_path))
+    df = pd.DataFrame({'artist': ['a'], 'title': ['c']}, index=pd.DatetimeIndex(['2024-01-01 10:00'], name='Zeit'))
+
+    storage.write('test', 'station', df)
+
+    assert df.index.name == 'Zeit'
+    assert storage.read('test', 'station').index.name == 'time'
+
+
+def test_update_keeps_timestamps_at_midnight(storage):
+    times = pd.DatetimeIndex(['2024-01-01 00:00', '2024-01-01 06:00', '2024-01-02 00:00'], name='time')
+    for t in times:
+        storage.update('test', 'station', pd.DataFrame({'artist': ['a'], 'title': [str(t)]}, index=times[times == t]))
+
+    pd.testing.assert_index_equal(storage.read('test', 'station').index, times)
+
+
+def test_query_selects_broadcasters_and_stations(storage):
+    for broadcaster, station in [('rbb', 'fritz'), ('rbb', 'radioeins'), ('ndr', 'ndr2')]:
+        storage.update(broadcaster, station, pd.DataFrame({'artist': ['a'], 'title': [station]},
+                                                          index=pd.DatetimeIndex(['2024-01-01 10:00'], name='time')))
+
+    assert list(storage.query(stations=['rbb'])['station']) == ['fritz', 'radioeins']
+    assert set(storage.query(stations=['fritz', ('ndr', 'ndr2')])['station']) == {'fritz', 'ndr2'}
+
+    with pytest.raises(ValueError):
+        storage.query(stations=['fritzz'])
@@ -1,16 +1,78 @@
-from concurrent.futures import ThreadPoolExecutor
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
 from wakepy import keep
 
-from extractors import *
-from extractors.playlist_extractor import PlaylistExtractor
+from extractors import extractor_classes
+from extractors.playlist_extractor import PlaylistExtractor, setup_logging
+from extractors.poller import Poller
+from extractors.raw_cache import PackedRawCache, RawCache
+from extractors.scheduler import Scheduler
+from extractors.storage import STORAGE_BACKENDS, ParquetStorage
+from extractors.transport import HttpxTransport
 
-extractors = [a for a in globals().values() if isclass(a) and issubclass(a, PlaylistExtractor) and a != PlaylistExtractor]
 
-with keep.running():
-    with ThreadPoolExecutor() as ex:
-        future_list = []
-        for cls in extractors:
-            future_list.append(ex.submit(cls().update_databases))
+if __name__ == '__main__':  # worker processes for extraction import this module as well
+    parser = argparse.ArgumentParser(description='Updates the databases of all stations of all broadcasters')
+    parser.add_argument('--storage', choices=STORAGE_BACKENDS, default='csv', help='storage backend (default: csv)')
+    parser.add_argument('--encode-songs', action='store_true',
+                        help='store artists and titles as IDs of a global dictionary (implies --storage parquet)')
+    parser.add_argument('--packed-raw', action='store_true',
+                        help='save raw documents compressed and deduplicated in segment files instead of single files')
+    parser.add_argument('--extract-workers', type=int, default=1,
+                        help='number of processes extracting the documents, shared by all broadcasters (default: 1)')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='number of time windows of all stations downloaded at the same time (default: 8)')
+    parser.add_argument('--at-risk', action='store_true',
+                        help='only list the hours which are deleted by the broadcaster before they can be downloaded')
+    parser.add_argument('--requests-per-second', type=float,
+                        help='network budget used by --at-risk to estimate when each hour is downloaded')
+    parser.add_argument('--poll', action='store_true',
+                        help='keep running and poll the current hour of every station (stop with Ctrl+C)')
+    parser.add_argument('--interval', type=float, default=60,
+                        help='seconds between two polls of a station with --poll (default: 60)')
+    parser.add_argument('--http2', action='store_true',
+                        help='send the requests with httpx over HTTP/2 if the server supports it (needs httpx[http2])')
+    parser.add_argument('--latency', action='store_true',
+                        help='print the number of requests and their latency per host when finished')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='write counters and histograms of the requests, extraction and storage to this file when '
+                             'finished (after every poll with --poll), in the Prometheus text format if it ends with '
+                             '.prom and as JSON otherwise')
+    parser.add_argument('--trace', metavar='PATH', help='append a line of JSON for every request, extraction and '
+                                                       'database update to this file')
+    args = parser.parse_args()
+    setup_logging()
+    PlaylistExtractor.metrics.trace_path = args.trace
 
-        for future in future_list:
-            future.result()
+    with keep.running():
+        storage = ParquetStorage(encode_songs=True) if args.encode_songs else STORAGE_BACKENDS[args.storage]()
+        raw_cache = PackedRawCache() if args.packed_raw else RawCache()
+        # one pool for all windows of all stations, instead of starting new processes for every window
+        extract_pool = ProcessPoolExecutor(max_workers=args.extract_workers) if args.extract_workers > 1 else None
+        scheduler = Scheduler([cls(storage=storage, raw_cache=raw_cache, extract_workers=args.extract_workers,
+                                   transport=HttpxTransport() if args.http2 else None, extract_pool=extract_pool)
+                               for cls in extractor_classes()], workers=args.workers)
+        try:
+            if args.poll:
+                Poller(scheduler.extractors, interval=pd.Timedelta(seconds=args.interval), workers=args.workers,
+                       metrics_path=args.metrics).run()
+            elif args.at_risk:
+                report = scheduler.report(args.requests_per_second)
+                at_risk = report[report['at_risk']].groupby(['broadcaster', 'station']).agg(
+                    hours=('hour', 'size'), first=('hour', 'min'), last=('hour', 'max'), deadline=('deadline', 'min'))
+                print(f'{len(report)} hours to download, {at_risk["hours"].sum()} at risk')
+                with pd.option_context('display.max_rows', None, 'display.width', 200):
+                    print(at_risk)
+            else:
+                scheduler.run()
+        finally:
+            if extract_pool is not None:
+                extract_pool.shutdown()
+            if args.metrics:
+                PlaylistExtractor.metrics.write(args.metrics)
+            if args.latency:
+                with pd.option_context('display.max_rows', None, 'display.width', 200,
+                                       'display.float_format', '{:.3f}'.format):
+                    print(pd.concat([e.transport.latency_report() for e in scheduler.extractors]))